@@ -0,0 +1,190 @@
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from api.mixins import ReferenceDataMixin
+from api.views import RecipeViewSet
+from core.cache import recipes_cache, reference_cache
+from core.registry import get_registry
+from core.routers import use_primary
+from recipes.models import Tag
+
+JSON_MEDIA_TYPES = ("", "*/*", "application/json")
+
+
+def async_read_view(view, fast_path):
+    """Асинхронная обёртка над DRF-представлением для режима ASGI.
+
+    GET-запросы анонимов, которым нужен JSON, сначала обрабатывает
+    корутина `fast_path`: она отвечает из кеша, а при промахе читает БД
+    асинхронным ORM, не занимая поток на весь запрос. Если она вернула
+    `None`, запрос, как и все остальные, уходит в обычное представление
+    через `sync_to_async`.
+    """
+    sync_view = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if _is_anonymous_json_get(request):
+            response = await fast_path(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+async def recipe_list(request):
+    return await _cached_recipes(
+        request,
+        "list",
+        *RecipeViewSet.list_cache_params(request.GET),
+        _render_recipe_list,
+    )
+
+
+async def recipe_detail(request, pk):
+    return await _cached_recipes(
+        request,
+        "retrieve",
+        *RecipeViewSet.detail_cache_params(pk),
+        partial(_render_recipe, pk=pk),
+    )
+
+
+def reference_list(viewset):
+    """Список справочника без фильтров и ответы 304 для `viewset`.
+
+    Тело списка берётся из `ReferenceDataMixin.rendered_lists` или
+    собирается асинхронным запросом к БД. Запросы с фильтрами без
+    совпавшего ETag обрабатывает обычное представление.
+    """
+    queryset = viewset.queryset
+    model_name = queryset.model._meta.model_name
+
+    async def fast_path(request):
+        (version,) = await reference_cache.agenerations(model_name)
+        etag = ReferenceDataMixin.reference_etag(
+            version, request.get_full_path(), "application/json"
+        )
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        elif request.GET:
+            return None
+        else:
+            rendered_lists = ReferenceDataMixin.rendered_lists
+            rendered_version, body = rendered_lists.get(
+                model_name, (None, None)
+            )
+            if rendered_version != version:
+                with use_primary():
+                    objects = [obj async for obj in queryset.all()]
+                body = JSONRenderer().render(
+                    viewset.serializer_class(objects, many=True).data
+                )
+                rendered_lists[model_name] = version, body
+            response = _json_response(body)
+
+        return ReferenceDataMixin.with_reference_headers(
+            response, etag, version
+        )
+
+    return fast_path
+
+
+async def _cached_recipes(request, action, generations, params, render):
+    """Ответ `RecipeViewSet` для анонима из кеша или асинхронного ORM.
+
+    Как и `RecipeViewSet._cached_response`, при промахе читает основную
+    БД и кладёт данные в кеш. `None` - ответ должно собрать обычное
+    представление: страницы или рецепта нет, либо в реестре тегов нет
+    тега рецепта.
+    """
+    key, data = await recipes_cache.aget(
+        generations, (request.scheme, request.get_host(), action, params)
+    )
+    cache_status = "HIT"
+    if data is None:
+        try:
+            with use_primary():
+                data = await render(request)
+        except APIException:
+            return None
+        if data is None:
+            return None
+        await recipes_cache.aset(key, data)
+        cache_status = "MISS"
+
+    response = _json_response(JSONRenderer().render(data))
+    response["X-Cache"] = cache_status
+    return response
+
+
+async def _render_recipe_list(request):
+    view = _recipe_view(request, "list")
+    queryset = view.get_queryset()
+    paginator = view.paginator
+    recipes = await paginator.apaginate_queryset(queryset, view.request, view)
+    data = await _serialize_recipes(view, recipes)
+    if data is None:
+        return None
+    return paginator.get_paginated_response(data).data
+
+
+async def _render_recipe(request, pk):
+    view = _recipe_view(request, "retrieve", pk=pk)
+    recipe = await view.get_queryset().filter(pk=pk).afirst()
+    if recipe is None:
+        return None
+    data = await _serialize_recipes(view, [recipe])
+    if data is None:
+        return None
+    return data[0]
+
+
+def _recipe_view(request, action, **kwargs):
+    """`RecipeViewSet` для анонимного запроса без аутентификации DRF."""
+    view = RecipeViewSet(
+        action=action, args=(), kwargs=kwargs, format_kwarg=None
+    )
+    view.request = Request(request, authenticators=())
+    return view
+
+
+async def _serialize_recipes(view, recipes):
+    """Сериализует рецепты, не обращаясь к БД из цикла событий.
+
+    Рецепты уже загружены со всеми связями, а записи тегов берутся из
+    реестра заранее. Если тега в реестре нет, реестр перечитал бы
+    таблицу синхронно, поэтому возвращается `None`.
+    """
+    records = await sync_to_async(get_registry(Tag).records)()
+    tags = (tag for recipe in recipes for tag in recipe.tags.all())
+    if any(tag.pk not in records for tag in tags):
+        return None
+
+    context = {**view.get_serializer_context(), "tag_records": records}
+    return view.serializer_class(recipes, many=True, context=context).data
+
+
+def _json_response(body):
+    response = HttpResponse(body, content_type="application/json")
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+def _is_anonymous_json_get(request):
+    accept = request.headers.get("Accept", "").split(",")[0].strip()
+    return (
+        request.method == "GET"
+        and "Authorization" not in request.headers
+        and "format" not in request.GET
+        and accept in JSON_MEDIA_TYPES
+    )
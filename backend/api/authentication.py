@@ -0,0 +1,64 @@
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.cache import token_cache
+
+# Поля пользователя, которые хранятся в кеше вместе с токеном. Хеш пароля
+# и личные данные в кеш не попадают и догружаются из БД при обращении.
+SNAPSHOT_FIELDS = ("id", "username", "is_active", "is_staff", "is_superuser")
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`TokenAuthentication`, который не ходит в БД на каждый запрос.
+
+    Пара токен-пользователь берётся из `token_cache`, а при промахе
+    загружается обычным способом и кешируется. Снимок сбрасывается
+    сигналами при удалении токена и любом сохранении пользователя,
+    в том числе при смене пароля и блокировке.
+
+    В снимке только `SNAPSHOT_FIELDS`, остальные поля восстановленного
+    пользователя отложены и загружаются одним запросом при первом
+    обращении к любому из них.
+    """
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, self._snapshot(user, token))
+            return user, token
+
+        user, token = self._restore(key, snapshot)
+        if not user.is_active:
+            token_cache.invalidate(key)
+            raise AuthenticationFailed("User inactive or deleted.")
+        return user, token
+
+    def _snapshot(self, user, token):
+        return (
+            user.pk,
+            token.created,
+            tuple(getattr(user, field) for field in SNAPSHOT_FIELDS),
+        )
+
+    def _restore(self, key, snapshot):
+        user_id, created, values = snapshot
+        Token = self.get_model()
+        User = Token._meta.get_field("user").related_model
+        # `from_db` ждёт значения в порядке полей модели.
+        values = dict(zip(SNAPSHOT_FIELDS, values))
+        field_names = [
+            field.attname
+            for field in User._meta.concrete_fields
+            if field.attname in values
+        ]
+        user = User.from_db(
+            User.objects.db,
+            field_names,
+            [values[field_name] for field_name in field_names],
+        )
+        token = Token(key=key, user_id=user_id, created=created)
+        token._state.adding = False
+        token._state.db = user._state.db
+        token.user = user
+        return user, token
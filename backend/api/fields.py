@@ -0,0 +1,102 @@
+import binascii
+import re
+import uuid
+from tempfile import SpooledTemporaryFile
+
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image, UnidentifiedImageError
+from rest_framework.fields import ImageField
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+
+from core.enums import Limits
+
+
+class RecipeImageField(Base64ImageField):
+    """Base64-картинка, декодируемая с ограничением по памяти.
+
+    Размер в байтах проверяется по длине base64-строки до
+    декодирования, формат и размеры в пикселях - по заголовку
+    картинки, как только он декодирован. Байты пишутся кусками во
+    временный файл, который уходит на диск после `spool_size`, и
+    сохраняются как есть: сама картинка в запросе не декодируется,
+    уменьшенные копии строит фоновая задача `core.images`.
+    """
+
+    ALLOWED_FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif"}
+    TOO_BIG_MESSAGE = "Картинка слишком большая."
+    chunk_size = 64 * 1024
+    spool_size = 1024 * 1024
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+
+        if not isinstance(base64_data, str):
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+
+        payload = base64_data.rpartition(";base64,")[2]
+        if re.search(r"\s", payload):
+            payload = re.sub(r"\s", "", payload)
+        if len(payload) // 4 * 3 > Limits.MAX_IMAGE_BYTES:
+            raise ValidationError(self.TOO_BIG_MESSAGE)
+
+        buffer = SpooledTemporaryFile(max_size=self.spool_size)
+        try:
+            image_format = self._decode(payload, buffer)
+        except ValidationError:
+            buffer.close()
+            raise
+
+        size = buffer.tell()
+        buffer.seek(0)
+        data = UploadedFile(
+            file=buffer,
+            name=f"{uuid.uuid4()}.{self.ALLOWED_FORMATS[image_format]}",
+            content_type=Image.MIME.get(image_format),
+            size=size,
+        )
+        return ImageField.to_internal_value(self, data)
+
+    def _decode(self, payload, buffer):
+        """Декодирует base64 кусками и возвращает формат картинки."""
+        image_format = None
+        for start in range(0, len(payload), self.chunk_size):
+            end = start + self.chunk_size
+            try:
+                buffer.write(binascii.a2b_base64(payload[start:end]))
+            except (binascii.Error, ValueError):
+                raise ValidationError(self.INVALID_FILE_MESSAGE)
+
+            if image_format is None:
+                image_format = self._check_header(buffer, partial=True)
+
+        if image_format is None:
+            image_format = self._check_header(buffer, partial=False)
+        return image_format
+
+    def _check_header(self, buffer, partial):
+        """Проверяет формат и размеры по заголовку и возвращает формат.
+
+        Пока заголовок не декодирован целиком, при `partial` вместо
+        ошибки возвращается `None`.
+        """
+        position = buffer.tell()
+        buffer.seek(0)
+        try:
+            with Image.open(buffer) as image:
+                image_format = image.format
+                width, height = image.size
+        except (UnidentifiedImageError, OSError):
+            if partial:
+                return None
+            raise ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            buffer.seek(position)
+
+        if image_format not in self.ALLOWED_FORMATS:
+            raise ValidationError(self.INVALID_TYPE_MESSAGE)
+        if width * height > Limits.MAX_IMAGE_PIXELS:
+            raise ValidationError(self.TOO_BIG_MESSAGE)
+        return image_format
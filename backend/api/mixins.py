@@ -1,22 +1,45 @@
+from hashlib import md5
+
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.serializers import ModelSerializer
 from rest_framework.status import (
+    HTTP_200_OK,
     HTTP_201_CREATED,
     HTTP_204_NO_CONTENT,
+    HTTP_304_NOT_MODIFIED,
     HTTP_400_BAD_REQUEST,
 )
 
-from django.db.models import Q
 from django.db.utils import IntegrityError
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from api.paginators import KeysetPagination
+from api.serializers import RecipeIdsSerializer
+from core.cache import reference_cache
+from core.enums import RelationStatus, UrlQueries
+from core.routers import use_primary
+from core.services import (
+    add_recipe_relations,
+    create_relation,
+    delete_relation,
+    remove_recipe_relations,
+)
+from foodgram.settings import REFERENCE_CACHE_MAX_AGE
 
 
 class AddDelViewMixin:
     def _create_relation(self, obj_id):
         obj = get_object_or_404(self.queryset, pk=obj_id)
         try:
-            self.link_model(None, obj.pk, self.request.user.pk).save()
+            created = create_relation(
+                self.link_model, self.request.user, obj.pk
+            )
         except IntegrityError:
+            created = None
+        if created is None:
             return Response(
                 {"error": "Действие выполнено ранее."},
                 status=HTTP_400_BAD_REQUEST,
@@ -25,16 +48,176 @@ class AddDelViewMixin:
         serializer: ModelSerializer = self.add_serializer(obj)
         return Response(serializer.data, status=HTTP_201_CREATED)
 
-    def _delete_relation(self, q):
-        to_delete = self.link_model.objects.filter(
-            q & Q(user=self.request.user)
-        ).first()
-        if to_delete:
-            deleted, _ = to_delete.delete()
-        if not deleted:
+    def _delete_relation(self, obj_id):
+        if delete_relation(self.link_model, self.request.user, obj_id) is None:
             return Response(
                 {"error": f"{self.link_model.__name__} не существует"},
                 status=HTTP_400_BAD_REQUEST,
             )
 
         return Response(status=HTTP_204_NO_CONTENT)
+
+    def _create_relations(self):
+        """Связывает пользователя сразу с несколькими рецептами.
+
+        Ответ содержит итог для каждого переданного id: `created`,
+        `exists` или `not_found`.
+        """
+        ids = self._batch_ids()
+        created, existing = add_recipe_relations(
+            self.link_model, self.request.user, ids
+        )
+        return self._batch_response(
+            ids,
+            {
+                **dict.fromkeys(created, RelationStatus.CREATED),
+                **dict.fromkeys(existing, RelationStatus.EXISTS),
+            },
+            RelationStatus.NOT_FOUND,
+        )
+
+    def _delete_relations(self):
+        """Удаляет связи пользователя сразу с несколькими рецептами.
+
+        Ответ содержит итог для каждого переданного id: `deleted` или
+        `missing`, если связи не было.
+        """
+        ids = self._batch_ids()
+        removed = remove_recipe_relations(
+            self.link_model, self.request.user, ids
+        )
+        return self._batch_response(
+            ids,
+            dict.fromkeys(removed, RelationStatus.DELETED),
+            RelationStatus.MISSING,
+        )
+
+    def _batch_ids(self):
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data["ids"]))
+
+    @staticmethod
+    def _batch_response(ids, statuses, default):
+        return Response(
+            {
+                "results": [
+                    {"id": pk, "status": statuses.get(pk, default).value}
+                    for pk in ids
+                ]
+            },
+            status=HTTP_200_OK,
+        )
+
+
+class CursorPaginationMixin:
+    """Переключает представление на курсорную пагинацию.
+
+    Курсорный режим включается параметром `?cursor=` (пустое значение -
+    первая страница) и доступен, только если задан `cursor_ordering`.
+    Без параметра используется обычный `pagination_class`.
+    """
+
+    cursor_pagination_class = KeysetPagination
+    cursor_ordering = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            pagination_class = self.pagination_class
+            if (
+                self.cursor_ordering is not None
+                and UrlQueries.CURSOR.value in self.request.query_params
+            ):
+                pagination_class = self.cursor_pagination_class
+
+            self._paginator = pagination_class() if pagination_class else None
+        return self._paginator
+
+    def get_ordering_param(self, fields):
+        """Возвращает сортировку из `?ordering=`, если поле разрешено.
+
+        Курсор построен на `cursor_ordering`, поэтому при другой
+        сортировке представление переходит на обычную пагинацию.
+        """
+        ordering = self.request.query_params.get(UrlQueries.ORDERING.value, "")
+        if ordering.lstrip("-") not in fields:
+            return None
+
+        self.cursor_ordering = None
+        return ordering
+
+
+class ReferenceDataMixin:
+    """Условные GET-запросы для редко меняющихся справочников.
+
+    Версия данных хранится в кеше и меняется сигналами при изменении
+    модели. ETag и Last-Modified выводятся из версии, поэтому на
+    `If-None-Match` ответ 304 отдаётся без обращения к БД. Тело
+    списка без фильтров рендерится один раз на версию и хранится в
+    памяти процесса. Версия должна быть в общем кеше (`core.checks`),
+    иначе другие воркеры отдают и подтверждают старое тело.
+    """
+
+    rendered_lists = {}
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            request, self._render_list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            request, super().retrieve, request, *args, **kwargs
+        )
+
+    def _conditional_response(self, request, get_response, *args, **kwargs):
+        (version,) = reference_cache.generations(
+            self.queryset.model._meta.model_name
+        )
+        etag = self.reference_etag(
+            version, request.get_full_path(), request.accepted_media_type
+        )
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            self.reference_version = version
+            response = get_response(*args, **kwargs)
+
+        return self.with_reference_headers(response, etag, version)
+
+    @staticmethod
+    def reference_etag(version, path, media_type):
+        return quote_etag(
+            md5(f"{version}:{path}:{media_type}".encode()).hexdigest()
+        )
+
+    @staticmethod
+    def with_reference_headers(response, etag, version):
+        """Делает кешируемыми только ответы 200 и 304."""
+        if response.status_code not in (HTTP_200_OK, HTTP_304_NOT_MODIFIED):
+            return response
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(version // 10**9)
+        response["Cache-Control"] = (
+            f"public, max-age={REFERENCE_CACHE_MAX_AGE}, must-revalidate"
+        )
+        return response
+
+    def _render_list(self, request, *args, **kwargs):
+        if request.query_params or request.accepted_renderer.format != "json":
+            return super().list(request, *args, **kwargs)
+
+        model_name = self.queryset.model._meta.model_name
+        version, body = self.rendered_lists.get(model_name, (None, None))
+        if version != self.reference_version:
+            with use_primary():
+                serializer = self.get_serializer(
+                    self.get_queryset(), many=True
+                )
+                body = JSONRenderer().render(serializer.data)
+            self.rendered_lists[model_name] = self.reference_version, body
+
+        return HttpResponse(body, content_type="application/json")
@@ -1,5 +1,219 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    Cursor,
+    CursorPagination,
+    PageNumberPagination,
+)
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Page
+from django.db.models import Q
+
+from core.enums import Limits, UrlQueries
+from core.feed import feed_page
 
 
 class PageLimitPagination(PageNumberPagination):
-    page_size_query_param = "limit"
+    page_size = Limits.PAGE_SIZE.value
+    page_size_query_param = UrlQueries.LIMIT.value
+    max_page_size = Limits.MAX_PAGE_SIZE.value
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` на асинхронном ORM для режима ASGI."""
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+
+        bottom = (number - 1) * page_size
+        top = bottom + page_size
+        objects = [obj async for obj in queryset[bottom:top]]
+        self.page = Page(objects, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+
+        self.request = request
+        return objects
+
+
+class KeysetPagination(CursorPagination):
+    """Пагинация по ключу `(<дата>, id)` без `COUNT` и `OFFSET`.
+
+    Позиция курсора - пара значений последнего элемента страницы,
+    поэтому следующая страница выбирается условием
+    `(date, id) < (last_date, last_id)` по индексу, а не сдвигом.
+    Порядок берётся из атрибута `cursor_ordering` представления.
+    """
+
+    cursor_query_param = UrlQueries.CURSOR.value
+    page_size = Limits.PAGE_SIZE.value
+    page_size_query_param = UrlQueries.LIMIT.value
+    max_page_size = Limits.MAX_PAGE_SIZE.value
+    ordering = ("-pub_date", "-id")
+    position_separator = "|"
+
+    def get_ordering(self, request, queryset, view):
+        return tuple(getattr(view, "cursor_ordering", None) or self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, reverse, position = self._page_queryset(
+            queryset, request, view
+        )
+        return self._set_page(
+            list(queryset[: self.page_size + 1]), reverse, position
+        )
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` на асинхронном ORM для режима ASGI."""
+        queryset, reverse, position = self._page_queryset(
+            queryset, request, view
+        )
+        return self._set_page(
+            [obj async for obj in queryset[: self.page_size + 1]],
+            reverse,
+            position,
+        )
+
+    def _page_queryset(self, queryset, request, view):
+        """Возвращает запрос страницы: с курсорной сортировкой и условием."""
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        reverse, position = False, None
+        if self.cursor is not None:
+            reverse, position = self.cursor.reverse, self.cursor.position
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith("-") else f"-{field}"
+                for field in ordering
+            )
+        queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            try:
+                queryset = queryset.filter(
+                    self._keyset_filter(ordering, position)
+                )
+            except (ValidationError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        return queryset, reverse, position
+
+    def _set_page(self, results, reverse, position):
+        """Запоминает страницу из `page_size + 1` строк запроса."""
+        self.page = results[: self.page_size]
+        has_following_position = len(results) > len(self.page)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(
+                self.page[-1], self.ordering
+            )
+        else:
+            position = self.cursor.position
+
+        cursor = Cursor(offset=0, reverse=False, position=position)
+        return self.encode_cursor(cursor)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(
+                self.page[0], self.ordering
+            )
+        else:
+            position = self.cursor.position
+
+        cursor = Cursor(offset=0, reverse=True, position=position)
+        return self.encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            value = getattr(instance, field.lstrip("-"))
+            if hasattr(value, "isoformat"):
+                value = value.isoformat()
+            values.append(str(value))
+
+        return self.position_separator.join(values)
+
+    def _keyset_filter(self, ordering, position):
+        """Строит условие "после позиции" для составного ключа."""
+        (date_order, id_order) = ordering
+        date_value, id_value = self._parse_position(position)
+        date_field, id_field = date_order.lstrip("-"), id_order.lstrip("-")
+        lookup = "lt" if date_order.startswith("-") else "gt"
+        return Q(**{f"{date_field}__{lookup}": date_value}) | Q(
+            **{date_field: date_value, f"{id_field}__{lookup}": id_value}
+        )
+
+    def _parse_position(self, position):
+        date_value, _, id_value = position.rpartition(self.position_separator)
+        if not date_value or not id_value.isdigit():
+            raise NotFound(self.invalid_cursor_message)
+
+        return date_value, int(id_value)
+
+
+class FeedPagination(KeysetPagination):
+    """Курсорная пагинация ленты подписок, только вперёд.
+
+    Страницу собирает `core.feed.feed_page`, а курсор кодирует
+    `(pub_date, id)` последнего рецепта, как в `KeysetPagination`.
+    """
+
+    def paginate_feed(self, request, user):
+        """Возвращает id рецептов текущей страницы ленты `user`."""
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+
+        position = None
+        if self.cursor is not None:
+            if self.cursor.reverse:
+                raise NotFound(self.invalid_cursor_message)
+            if self.cursor.position is not None:
+                position = self._parse_position(self.cursor.position)
+
+        try:
+            self.page, self.has_next = feed_page(
+                user, self.page_size, position
+            )
+        except (ValidationError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        self.has_previous = False
+        return [item.id for item in self.page]
@@ -24,7 +24,7 @@ class AuthorStaffOrReadOnly(BanPermission):
 
 
 class AdminOrReadOnly(BanPermission):
-    def has_object_permission(self, request, view):
+    def has_object_permission(self, request, view, obj):
         return (
             request.method in SAFE_METHODS
             or request.user.is_authenticated
@@ -1,12 +1,21 @@
-from drf_extra_fields.fields import Base64ImageField
-from rest_framework.serializers import ModelSerializer, SerializerMethodField
+from rest_framework.serializers import (
+    IntegerField,
+    ListField,
+    ModelSerializer,
+    Serializer,
+    SerializerMethodField,
+)
 
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from django.db.models import F
+from django.core.files.storage import default_storage
 from django.db.transaction import atomic
 
-from core.services import recipe_ingredients_set
+from api.fields import RecipeImageField
+from core.enums import Limits
+from core.images import is_same_image
+from core.registry import get_registry
+from core.services import recipe_ingredients_set, recipe_ingredients_update
 from core.validators import ingredients_validator, tags_exist_validator
 from recipes.models import Ingredient, Recipe, Tag
 
@@ -33,6 +42,16 @@ class ShortRecipeSerializer(ModelSerializer):
         )
 
 
+class RecipeIdsSerializer(Serializer):
+    """Список id рецептов для пакетных действий с избранным и корзиной."""
+
+    ids = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=Limits.MAX_BATCH_SIZE,
+    )
+
+
 class UserSerializer(ModelSerializer):
     is_subscribed = SerializerMethodField()
 
@@ -51,12 +70,16 @@ class UserSerializer(ModelSerializer):
         read_only_fields = ("is_subscribed",)
 
     def get_is_subscribed(self, object):
+        is_subscribed = getattr(object, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
+
         user = self.context.get("request").user
 
         if user.is_anonymous or (user == object):
             return False
 
-        return user.subscriptions.filter(author=object).exists()
+        return user.subscription.filter(author=object).exists()
 
     def create(self, validated_data) -> User:
         user = User(
@@ -72,7 +95,6 @@ class UserSerializer(ModelSerializer):
 
 class UserSubscribeSerializer(UserSerializer):
     recipes = ShortRecipeSerializer(many=True, read_only=True)
-    recipes_count = SerializerMethodField()
 
     class Meta:
         model = User
@@ -100,9 +122,6 @@ class UserSubscribeSerializer(UserSerializer):
     def get_is_subscribed(*args):
         return True
 
-    def get_recipes_count(self, object):
-        return object.recipes.count()
-
 
 class TagSerializer(ModelSerializer):
     class Meta:
@@ -139,12 +158,13 @@ class IngredientSerializer(ModelSerializer):
 
 
 class RecipeSerializer(ModelSerializer):
-    tags = TagSerializer(many=True, read_only=True)
+    tags = SerializerMethodField()
     author = UserSerializer(read_only=True)
     ingredients = SerializerMethodField()
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
-    image = Base64ImageField()
+    image = RecipeImageField()
+    image_renditions = SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -157,6 +177,7 @@ class RecipeSerializer(ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_renditions",
             "text",
             "cooking_time",
         )
@@ -165,13 +186,74 @@ class RecipeSerializer(ModelSerializer):
             "is_shopping_cart",
         )
 
+    def to_representation(self, recipe):
+        is_subscribed = getattr(recipe, "author_is_subscribed", None)
+        if recipe.author is not None and is_subscribed is not None:
+            recipe.author.is_subscribed = is_subscribed
+
+        return super().to_representation(recipe)
+
+    def get_tags(self, recipe):
+        """Берёт поля тегов из реестра, а не из строк БД.
+
+        Версию реестра проверяет только первый рецепт: записи
+        сохраняются в общем контексте сериализатора, и весь список
+        рецептов обходится с одним обращением к кешу.
+        """
+        registry = get_registry(Tag)
+        records = self.context.get("tag_records")
+        if records is None:
+            records = self.context["tag_records"] = registry.records()
+        tags = []
+        for tag in recipe.tags.all():
+            record = records.get(tag.pk)
+            if record is None:
+                # Тег мог появиться после загрузки реестра: `get()`
+                # перечитает таблицу, если тег есть в БД.
+                record = registry.get(tag.pk)
+                if record is not None:
+                    records = self.context["tag_records"] = registry.records()
+            if record is None:
+                tags.append(TagSerializer(tag).data)
+            else:
+                tags.append(
+                    {
+                        field: getattr(record, field)
+                        for field in TagSerializer.Meta.fields
+                    }
+                )
+        return tags
+
     def get_ingredients(self, recipe):
-        ingredients = recipe.ingredients.values(
-            "id", "name", "measurement_unit", amount=F("recipe__amount")
-        )
-        return ingredients
+        return [
+            {
+                "id": link.ingredients.id,
+                "name": link.ingredients.name,
+                "measurement_unit": link.ingredients.measurement_unit,
+                "amount": link.amount,
+            }
+            for link in recipe.ingredient.all()
+        ]
+
+    def get_image_renditions(self, recipe):
+        request = self.context.get("request")
+        return {
+            size: {
+                image_format: (
+                    request.build_absolute_uri(default_storage.url(name))
+                    if request
+                    else default_storage.url(name)
+                )
+                for image_format, name in formats.items()
+            }
+            for size, formats in recipe.image_renditions.items()
+        }
 
     def get_is_favorited(self, recipe):
+        is_favorited = getattr(recipe, "is_favorited", None)
+        if is_favorited is not None:
+            return is_favorited
+
         user = self.context.get("view").request.user
 
         if user.is_anonymous:
@@ -180,6 +262,10 @@ class RecipeSerializer(ModelSerializer):
         return user.favorites.filter(recipe=recipe).exists()
 
     def get_is_in_shopping_cart(self, recipe):
+        is_in_shopping_cart = getattr(recipe, "is_in_shopping_cart", None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
+
         user = self.context.get("view").request.user
 
         if user.is_anonymous:
@@ -220,17 +306,19 @@ class RecipeSerializer(ModelSerializer):
         tags = validated_data.pop("tags")
         ingredients = validated_data.pop("ingredients")
 
+        image = validated_data.get("image")
+        if image and is_same_image(recipe.image_renditions, image):
+            del validated_data["image"]
+
         for key, value in validated_data.items():
             if hasattr(recipe, key):
                 setattr(recipe, key, value)
 
         if tags:
-            recipe.tags.clear()
             recipe.tags.set(tags)
 
         if ingredients:
-            recipe.ingredients.clear()
-            recipe_ingredients_set(recipe, ingredients)
+            recipe_ingredients_update(recipe, ingredients)
 
         recipe.save()
         return recipe
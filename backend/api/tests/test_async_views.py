@@ -0,0 +1,90 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, TestCase
+
+from api.async_views import recipe_detail, recipe_list
+from recipes.models import AmountIngredient, Ingredient, Recipe, Tag
+
+User = get_user_model()
+
+
+class AsyncRecipeViewsTest(TestCase):
+    """Асинхронные ответы для анонимов совпадают с ответами DRF.
+
+    Синхронный ORM из цикла событий поднял бы `SynchronousOnlyOperation`,
+    поэтому тест заодно проверяет, что промах кеша обходится без него.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username="author",
+            email="author@example.com",
+            password="Password-12345",
+            first_name="Имя",
+            last_name="Фамилия",
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f"тег{index}", color="#FFFFFF", slug=f"tag{index}")
+            for index in range(2)
+        )
+        ingredient = Ingredient.objects.create(
+            name="ингредиент", measurement_unit="г"
+        )
+        for index in range(8):
+            recipe = Recipe.objects.create(
+                author=author,
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=10,
+            )
+            recipe.tags.set(tags[: index % 2 + 1])
+            AmountIngredient.objects.create(
+                recipe=recipe, ingredients=ingredient, amount=index + 1
+            )
+        cls.recipe = recipe
+
+    def setUp(self):
+        cache.clear()
+        self.factory = AsyncRequestFactory()
+
+    async def assert_same(self, view, path, params=None, **kwargs):
+        expected = await self.async_client.get(path, params)
+        cache.clear()
+
+        response = await view(self.factory.get(path, params), **kwargs)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(json.loads(response.content), expected.json())
+
+        response = await view(self.factory.get(path, params), **kwargs)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    async def test_list(self):
+        await self.assert_same(recipe_list, "/api/recipes/")
+
+    async def test_list_filters_and_pages(self):
+        await self.assert_same(
+            recipe_list,
+            "/api/recipes/",
+            {"tags": "tag1", "limit": 2, "page": 2},
+        )
+
+    async def test_list_cursor(self):
+        await self.assert_same(
+            recipe_list, "/api/recipes/", {"cursor": "", "limit": 3}
+        )
+
+    async def test_detail(self):
+        await self.assert_same(
+            recipe_detail,
+            f"/api/recipes/{self.recipe.pk}/",
+            pk=self.recipe.pk,
+        )
+
+    async def test_errors_go_to_sync_view(self):
+        request = self.factory.get("/api/recipes/", {"page": 100})
+        self.assertIsNone(await recipe_list(request))
+        request = self.factory.get("/api/recipes/0/")
+        self.assertIsNone(await recipe_detail(request, pk=0))
@@ -0,0 +1,83 @@
+from rest_framework.test import APIClient
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from recipes.models import AmountIngredient, Ingredient, Recipe, Tag
+from users.models import Subscription
+
+User = get_user_model()
+
+
+class QueryCountTest(TestCase):
+    """Число запросов не зависит от числа рецептов, тегов и ингредиентов.
+
+    Если здесь выросло число запросов, в сериализатор или представление
+    вернулся запрос на каждый объект (N+1).
+    """
+
+    RECIPES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author = (
+            User.objects.create_user(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password="Password-12345",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for index in range(2)
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(name=f"тег{index}", color="#FFFFFF", slug=f"tag{index}")
+            for index in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f"ингредиент{index}", measurement_unit="г")
+            for index in range(5)
+        )
+        for index in range(cls.RECIPES):
+            recipe = Recipe.objects.create(
+                author=cls.author,
+                name=f"Рецепт {index}",
+                text="Описание",
+                cooking_time=10,
+            )
+            recipe.tags.set(tags)
+            AmountIngredient.objects.bulk_create(
+                AmountIngredient(
+                    recipe=recipe, ingredients=ingredient, amount=index + 1
+                )
+                for ingredient in ingredients
+            )
+        cls.recipe = recipe
+        Subscription.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_queries(self, number, path, **params):
+        # Первый запрос загружает справочники в реестр процесса.
+        self.client.get(path, params)
+        with self.assertNumQueries(number):
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recipe_list(self):
+        response = self.assert_queries(4, "/api/recipes/")
+        self.assertEqual(response.data["count"], self.RECIPES)
+
+    def test_recipe_detail(self):
+        self.assert_queries(3, f"/api/recipes/{self.recipe.pk}/")
+
+    def test_subscriptions(self):
+        response = self.assert_queries(
+            3, "/api/users/subscriptions/", recipes_limit=3
+        )
+        self.assertEqual(len(response.data["results"][0]["recipes"]), 3)
@@ -0,0 +1,164 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Barrier
+from unittest import skipUnless
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.services import (
+    add_recipe_relations,
+    create_relation,
+    delete_relation,
+    remove_recipe_relations,
+)
+from recipes.models import Favorite, Recipe
+
+User = get_user_model()
+
+
+@skipUnless(
+    connection.features.can_return_columns_from_insert,
+    "нужна БД с INSERT ... RETURNING",
+)
+class RelationReturningTest(TestCase):
+    """Повторная вставка или удаление связи не меняют счётчик.
+
+    Та же гонка, что в `ConcurrentRelationTest`, но без потоков:
+    второй `INSERT ... ON CONFLICT DO NOTHING RETURNING` не возвращает
+    строки, второй `DELETE ... RETURNING` - тоже.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, author = (
+            User.objects.create_user(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password="Password-12345",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for index in range(2)
+        )
+        cls.recipe = Recipe.objects.create(
+            author=author, name="Рецепт", text="Описание", cooking_time=10
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_favorites(self, count):
+        favorites = Favorite.objects.filter(user=self.user, recipe=self.recipe)
+        self.assertEqual(favorites.count(), count)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, count)
+
+    def test_duplicate_create(self):
+        self.assertIsNotNone(
+            create_relation(Favorite, self.user, self.recipe.pk)
+        )
+        with CaptureQueriesContext(connection) as context:
+            duplicate = create_relation(Favorite, self.user, self.recipe.pk)
+
+        self.assertIsNone(duplicate)
+        self.assertTrue(
+            any("ON CONFLICT" in query["sql"] for query in context)
+        )
+        self.assert_favorites(1)
+
+    def test_duplicate_delete(self):
+        create_relation(Favorite, self.user, self.recipe.pk)
+        self.assertIsNotNone(
+            delete_relation(Favorite, self.user, self.recipe.pk)
+        )
+        self.assertIsNone(delete_relation(Favorite, self.user, self.recipe.pk))
+        self.assert_favorites(0)
+
+    def test_duplicate_batch(self):
+        ids = [self.recipe.pk, 0]
+        self.assertEqual(
+            add_recipe_relations(Favorite, self.user, ids),
+            ({self.recipe.pk}, set()),
+        )
+        self.assertEqual(
+            add_recipe_relations(Favorite, self.user, ids),
+            (set(), {self.recipe.pk}),
+        )
+        self.assert_favorites(1)
+
+        self.assertEqual(
+            remove_recipe_relations(Favorite, self.user, ids),
+            {self.recipe.pk},
+        )
+        self.assertEqual(
+            remove_recipe_relations(Favorite, self.user, ids), set()
+        )
+        self.assert_favorites(0)
+
+
+class ConcurrentRelationTest(TransactionTestCase):
+    """Одновременные запросы на одну и ту же связь создают её один раз.
+
+    Запросы выполняются в отдельных потоках, у каждого своё соединение
+    с БД, поэтому гонку разрешает уникальное ограничение таблицы.
+    """
+
+    THREADS = 8
+
+    def setUp(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            # Общая in-memory БД SQLite не ждёт блокировку таблицы, а сразу
+            # отвечает "database table is locked".
+            self.skipTest("нужна БД, которая умеет ждать блокировки")
+        cache.clear()
+        self.user, author = (
+            User.objects.create_user(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password="Password-12345",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for index in range(2)
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name="Рецепт", text="Описание", cooking_time=10
+        )
+
+    def test_favorite_created_once(self):
+        barrier = Barrier(self.THREADS)
+
+        def add_to_favorites():
+            client = APIClient()
+            client.force_authenticate(self.user)
+            try:
+                barrier.wait()
+                return client.post(
+                    f"/api/recipes/{self.recipe.pk}/favorite/"
+                ).status_code
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.THREADS) as executor:
+            codes = [
+                future.result()
+                for future in [
+                    executor.submit(add_to_favorites)
+                    for _ in range(self.THREADS)
+                ]
+            ]
+
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1, codes)
+        self.assertEqual(
+            codes.count(status.HTTP_400_BAD_REQUEST), self.THREADS - 1, codes
+        )
+        favorites = Favorite.objects.filter(user=self.user, recipe=self.recipe)
+        self.assertEqual(favorites.count(), 1)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
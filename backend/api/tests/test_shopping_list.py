@@ -0,0 +1,88 @@
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from recipes.models import AmountIngredient, Carts, Ingredient, Recipe
+
+User = get_user_model()
+
+URL = "/api/recipes/download_shopping_cart/"
+
+
+class ShoppingListPDFTest(TestCase):
+    """PDF списка покупок рисуется в фоне и забирается по ссылке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = (
+            User.objects.create_user(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password="Password-12345",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for index in range(2)
+        )
+        recipe = Recipe.objects.create(
+            author=cls.other, name="Рецепт", text="Описание", cooking_time=10
+        )
+        AmountIngredient.objects.create(
+            recipe=recipe,
+            ingredients=Ingredient.objects.create(
+                name="мука", measurement_unit="г"
+            ),
+            amount=200,
+        )
+        Carts.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        media = TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def start_job(self, run):
+        # Задание выполняется сразу в потоке теста, а соединение с БД
+        # остаётся открытым: в нём идёт транзакция `TestCase`.
+        with mock.patch("core.services.image_executor") as executor:
+            if run:
+                executor.submit.side_effect = lambda job, *args: job(*args)
+            with mock.patch("core.services.connections"):
+                response = self.client.get(URL, {"format": "pdf"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response["Location"], response.data["url"])
+        return response.data["url"]
+
+    def test_pdf_ready(self):
+        url = self.start_job(run=True)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        document = b"".join(response.streaming_content)
+        self.assertTrue(document.startswith(b"%PDF"))
+
+    def test_pdf_pending(self):
+        url = self.start_job(run=False)
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["url"], url)
+
+    def test_pdf_of_other_user(self):
+        url = self.start_job(run=True)
+
+        self.client.force_authenticate(self.other)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
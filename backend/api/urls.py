@@ -2,6 +2,12 @@ from rest_framework.routers import DefaultRouter
 
 from django.urls import include, path
 
+from api.async_views import (
+    async_read_view,
+    recipe_detail,
+    recipe_list,
+    reference_list,
+)
 from api.views import (
     BaseAPIRootView,
     IngredientViewSet,
@@ -9,6 +15,7 @@ from api.views import (
     TagViewSet,
     UserViewSet,
 )
+from foodgram.settings import SERVER_MODE
 
 app_name = "api"
 
@@ -27,3 +34,57 @@ urlpatterns = (
     path("", include(router.urls)),
     path("auth/", include("djoser.urls.authtoken")),
 )
+
+if SERVER_MODE == "asgi":
+    urlpatterns = (
+        path(
+            "recipes/",
+            async_read_view(
+                RecipeViewSet.as_view(
+                    {"get": "list", "post": "create"},
+                    basename="recipes",
+                    detail=False,
+                ),
+                recipe_list,
+            ),
+            name="recipes-list",
+        ),
+        path(
+            "recipes/<int:pk>/",
+            async_read_view(
+                RecipeViewSet.as_view(
+                    {
+                        "get": "retrieve",
+                        "put": "update",
+                        "patch": "partial_update",
+                        "delete": "destroy",
+                    },
+                    basename="recipes",
+                    detail=True,
+                ),
+                recipe_detail,
+            ),
+            name="recipes-detail",
+        ),
+        path(
+            "tags/",
+            async_read_view(
+                TagViewSet.as_view(
+                    {"get": "list"}, basename="tags", detail=False
+                ),
+                reference_list(TagViewSet),
+            ),
+            name="tags-list",
+        ),
+        path(
+            "ingredients/",
+            async_read_view(
+                IngredientViewSet.as_view(
+                    {"get": "list"}, basename="ingredients", detail=False
+                ),
+                reference_list(IngredientViewSet),
+            ),
+            name="ingredients-list",
+        ),
+        *urlpatterns,
+    )
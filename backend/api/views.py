@@ -2,15 +2,36 @@ from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.routers import APIRootView
-from rest_framework.status import HTTP_400_BAD_REQUEST
+from rest_framework.status import (
+    HTTP_200_OK,
+    HTTP_202_ACCEPTED,
+    HTTP_400_BAD_REQUEST,
+    HTTP_404_NOT_FOUND,
+    HTTP_500_INTERNAL_SERVER_ERROR,
+)
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
 from django.contrib.auth import get_user_model
-from django.db.models import Q
-from django.http.response import HttpResponse
-
-from api.mixins import AddDelViewMixin
-from api.paginators import PageLimitPagination
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import (
+    Exists,
+    F,
+    OuterRef,
+    Prefetch,
+    Value,
+    Window,
+)
+from django.db.models.functions import RowNumber
+from django.http.response import StreamingHttpResponse
+from django.urls import reverse
+
+from api.mixins import (
+    AddDelViewMixin,
+    CursorPaginationMixin,
+    ReferenceDataMixin,
+)
+from api.negotiation import IgnoreFormatNegotiation
+from api.paginators import FeedPagination, PageLimitPagination
 from api.permissions import (
     AdminOrReadOnly,
     AuthorStaffOrReadOnly,
@@ -24,9 +45,31 @@ from api.serializers import (
     TagSerializer,
     UserSubscribeSerializer,
 )
-from core.enums import Tuples, UrlQueries
-from core.services import create_shoping_list, maybe_wrong_layout
-from recipes.models import Carts, Favorite, Ingredient, Recipe, Tag
+from core.cache import (
+    recipe_detail_generations,
+    recipe_list_generations,
+    recipes_cache,
+)
+from core.enums import JobStatus, Limits, Tuples, UrlQueries
+from core.routers import use_primary
+from core.search import fuzzy_search, ingredient_index, recipe_search
+from core.services import (
+    SHOPPING_LIST_CONTENT_TYPES,
+    create_shoping_list,
+    iterate_async,
+    read_shopping_list_pdf,
+    shopping_list_pdf_job,
+    start_shopping_list_pdf,
+)
+from foodgram.settings import INGREDIENTS_SEARCH_MODE
+from recipes.models import (
+    AmountIngredient,
+    Carts,
+    Favorite,
+    Ingredient,
+    Recipe,
+    Tag,
+)
 from users.models import Subscription
 
 User = get_user_model()
@@ -36,7 +79,7 @@ class BaseAPIRootView(APIRootView):
     """Базовые пути API приложения."""
 
 
-class UserViewSet(DjoserUserViewSet, AddDelViewMixin):
+class UserViewSet(CursorPaginationMixin, DjoserUserViewSet, AddDelViewMixin):
     pagination_class = PageLimitPagination
     permission_classes = (DjangoModelPermissions,)
     add_serializer = UserSubscribeSerializer
@@ -48,59 +91,173 @@ class UserViewSet(DjoserUserViewSet, AddDelViewMixin):
 
     @subscribe.mapping.post
     def create_subscribe(self, request, id):
+        self.queryset = self._with_recipes(User.objects.all())
         return self._create_relation(id)
 
     @subscribe.mapping.delete
     def delete_subscribe(self, request, id):
-        return self._delete_relation(Q(author__id=id))
+        return self._delete_relation(id)
 
     @action(
         methods=("get",), detail=False, permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
+        self.cursor_ordering = ("-subscribed_at", "-id")
+        ordering = self.get_ordering_param(Tuples.AUTHORS_ORDERING.value)
         pages = self.paginate_queryset(
-            User.objects.filter(subscribers__user=self.request.user)
+            self._with_recipes(
+                User.objects.filter(subscribers__user=self.request.user)
+                .annotate(subscribed_at=F("subscribers__date_added"))
+                .order_by(
+                    *((ordering, "id") if ordering else User._meta.ordering)
+                )
+            )
         )
         serializer = UserSubscribeSerializer(pages, many=True)
         return self.get_paginated_response(serializer.data)
 
+    def _with_recipes(self, queryset):
+        """Добавляет к авторам их последние рецепты.
 
-class TagViewSet(ReadOnlyModelViewSet):
+        Рецепты загружаются одним запросом на страницу, а
+        `ROW_NUMBER() OVER (PARTITION BY author_id)` оставляет каждому
+        автору не больше `recipes_limit` последних рецептов.
+        """
+        recipes = Recipe.objects.order_by("-pub_date", "-id")
+        recipes_limit = self.request.query_params.get(
+            UrlQueries.RECIPES_LIMIT.value, ""
+        )
+        if recipes_limit.isdigit():
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F("author"),
+                    order_by=(F("pub_date").desc(), F("id").desc()),
+                )
+            ).filter(
+                row_number__lte=min(
+                    int(recipes_limit), Limits.MAX_PAGE_SIZE.value
+                )
+            )
+
+        return queryset.prefetch_related(
+            Prefetch("recipes", queryset=recipes)
+        )
+
+
+class TagViewSet(ReferenceDataMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AdminOrReadOnly,)
 
+    def get_queryset(self):
+        name = self.request.query_params.get(UrlQueries.SEARCH_INGREGIENT_NAME)
+
+        if not name:
+            return super().get_queryset()
+
+        return fuzzy_search(self.queryset, name)
+
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceDataMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AdminOrReadOnly,)
 
     def get_queryset(self):
         name = self.request.query_params.get(UrlQueries.SEARCH_INGREGIENT_NAME)
-        queryset = self.queryset
 
         if not name:
-            return queryset
+            return super().get_queryset()
 
-        name = maybe_wrong_layout(name)
-        start_queryset = queryset.filter(name__istartswith=name)
-        start_names = (ing.name for ing in start_queryset)
-        contain_queryset = queryset.filter(name__icontains=name).exclude(
-            name__in=start_names
-        )
-        return list(start_queryset) + list(contain_queryset)
+        if INGREDIENTS_SEARCH_MODE == "trigram":
+            return fuzzy_search(self.queryset, name)
 
+        return ingredient_index.search(name)
 
-class RecipeViewSet(ModelViewSet, AddDelViewMixin):
-    queryset = Recipe.objects.all()
+
+class RecipeViewSet(CursorPaginationMixin, ModelViewSet, AddDelViewMixin):
+    queryset = Recipe.objects.defer("search_vector")
     serializer_class = RecipeSerializer
     permission_classes = (AuthorStaffOrReadOnly,)
     pagination_class = PageLimitPagination
+    cursor_ordering = ("-pub_date", "-id")
     add_serializer = ShortRecipeSerializer
 
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(
+            *self.list_cache_params(request.query_params),
+            super().list,
+            request,
+            *args,
+            **kwargs,
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            *self.detail_cache_params(kwargs["pk"]),
+            super().retrieve,
+            request,
+            *args,
+            **kwargs,
+        )
+
+    @staticmethod
+    def list_cache_params(query_params):
+        """Поколения и параметры ключа кеша для списка рецептов."""
+        tags = sorted(set(query_params.getlist(UrlQueries.TAGS.value)))
+        author = query_params.get(UrlQueries.AUTHOR.value) or None
+        params = (
+            tags,
+            author,
+            *(
+                query_params.get(param.value)
+                for param in (
+                    UrlQueries.PAGE,
+                    UrlQueries.LIMIT,
+                    UrlQueries.CURSOR,
+                    UrlQueries.ORDERING,
+                    UrlQueries.SEARCH,
+                )
+            ),
+        )
+        return recipe_list_generations(author, tags), params
+
+    @staticmethod
+    def detail_cache_params(pk):
+        return recipe_detail_generations(pk), (str(pk),)
+
+    def _cached_response(
+        self, generations, params, get_response, *args, **kwargs
+    ):
+        """Отдаёт анонимным пользователям ответ из кеша.
+
+        Для анонимов флаги избранного и корзины всегда ложны, поэтому
+        ответ зависит только от параметров запроса. Ключ включает
+        поколения данных, которые сбрасываются сигналами в `core.signals`.
+        """
+        if not self.request.user.is_anonymous:
+            return get_response(*args, **kwargs)
+
+        request = self.request
+        key, data = recipes_cache.get(
+            generations,
+            (request.scheme, request.get_host(), self.action, params),
+        )
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        with use_primary():
+            response = get_response(*args, **kwargs)
+        if response.status_code == HTTP_200_OK:
+            recipes_cache.set(key, response.data)
+        response["X-Cache"] = "MISS"
+        return response
+
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self._serialized_queryset()
 
         tags = self.request.query_params.getlist(UrlQueries.TAGS.value)
         if tags:
@@ -110,23 +267,77 @@ class RecipeViewSet(ModelViewSet, AddDelViewMixin):
         if author:
             queryset = queryset.filter(author=author)
 
+        search = self.request.query_params.get(UrlQueries.SEARCH.value)
+        if search and search.strip():
+            self.cursor_ordering = None
+            queryset = recipe_search(queryset, search)
+
+        ordering = self.get_ordering_param(Tuples.RECIPES_ORDERING.value)
+        if ordering:
+            queryset = queryset.order_by(
+                ordering, "-id" if ordering.startswith("-") else "id"
+            )
+
         if self.request.user.is_anonymous:
             return queryset
 
         is_in_cart = self.request.query_params.get(UrlQueries.SHOP_CART)
         if is_in_cart in Tuples.SYMBOL_TRUE_SEARCH.value:
-            queryset = queryset.filter(in_carts__user=self.request.user)
+            queryset = queryset.filter(is_in_shopping_cart=True)
         elif is_in_cart in Tuples.SYMBOL_FALSE_SEARCH.value:
-            queryset = queryset.exclude(in_carts__user=self.request.user)
+            queryset = queryset.filter(is_in_shopping_cart=False)
 
         is_favorite = self.request.query_params.get(UrlQueries.FAVORITE)
         if is_favorite in Tuples.SYMBOL_TRUE_SEARCH.value:
-            queryset = queryset.filter(in_favorites__user=self.request.user)
+            queryset = queryset.filter(is_favorited=True)
         if is_favorite in Tuples.SYMBOL_FALSE_SEARCH.value:
-            queryset = queryset.exclude(in_favorites__user=self.request.user)
+            queryset = queryset.filter(is_favorited=False)
 
         return queryset
 
+    def _serialized_queryset(self):
+        """Рецепты со всем, что нужно сериализатору, без фильтров запроса."""
+        queryset = self.queryset.select_related("author").prefetch_related(
+            Prefetch("tags", queryset=Tag.objects.only("id")),
+            Prefetch(
+                "ingredient",
+                queryset=AmountIngredient.objects.select_related(
+                    "ingredients"
+                ),
+            ),
+        )
+        return self._annotate_user_flags(queryset)
+
+    def _annotate_user_flags(self, queryset):
+        """Добавляет к рецептам флаги текущего пользователя.
+
+        Флаги считаются подзапросами `EXISTS` в том же запросе,
+        что и сами рецепты, поэтому сериализатору не нужны
+        дополнительные обращения к БД.
+        """
+        user = self.request.user
+
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(recipe=OuterRef("pk"), user=user)
+            ),
+            is_in_shopping_cart=Exists(
+                Carts.objects.filter(recipe=OuterRef("pk"), user=user)
+            ),
+            author_is_subscribed=Exists(
+                Subscription.objects.filter(
+                    author=OuterRef("author"), user=user
+                )
+            ),
+        )
+
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def favorite(self, request, pk):
         """Добавляет/удалет рецепт в `избранное`."""
@@ -139,7 +350,7 @@ class RecipeViewSet(ModelViewSet, AddDelViewMixin):
     @favorite.mapping.delete
     def remove_recipe_from_favorites(self, request, pk):
         self.link_model = Favorite
-        return self._delete_relation(Q(recipe__id=pk))
+        return self._delete_relation(pk)
 
     @action(detail=True, permission_classes=(IsAuthenticated,))
     def shopping_cart(self, request, pk):
@@ -153,18 +364,127 @@ class RecipeViewSet(ModelViewSet, AddDelViewMixin):
     @shopping_cart.mapping.delete
     def remove_recipe_from_cart(self, request, pk):
         self.link_model = Carts
-        return self._delete_relation(Q(recipe__id=pk))
+        return self._delete_relation(pk)
+
+    @action(
+        methods=("post",),
+        detail=False,
+        url_path="favorite",
+        permission_classes=(IsAuthenticated,),
+    )
+    def recipes_to_favorites(self, request):
+        self.link_model = Favorite
+        return self._create_relations()
+
+    @recipes_to_favorites.mapping.delete
+    def remove_recipes_from_favorites(self, request):
+        self.link_model = Favorite
+        return self._delete_relations()
+
+    @action(
+        methods=("post",),
+        detail=False,
+        url_path="shopping_cart",
+        permission_classes=(IsAuthenticated,),
+    )
+    def recipes_to_cart(self, request):
+        self.link_model = Carts
+        return self._create_relations()
+
+    @recipes_to_cart.mapping.delete
+    def remove_recipes_from_cart(self, request):
+        self.link_model = Carts
+        return self._delete_relations()
 
-    @action(methods=("get",), detail=False)
+    @action(
+        methods=("get",), detail=False, permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Последние рецепты авторов, на которых подписан пользователь.
+
+        Страницу выбирает `FeedPagination`, поэтому фильтры списка
+        рецептов (`tags`, `author`, `search`, ...) к ленте не применяются.
+        """
+        paginator = FeedPagination()
+        recipe_ids = paginator.paginate_feed(request, request.user)
+        recipes = self._serialized_queryset().in_bulk(recipe_ids)
+        serializer = self.get_serializer(
+            [recipes[pk] for pk in recipe_ids if pk in recipes], many=True
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        content_negotiation_class=IgnoreFormatNegotiation,
+    )
     def download_shopping_cart(self, request):
         user = self.request.user
         if not user.carts.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
 
-        filename = f"{user.username}_shopping_list.txt"
-        shopping_list = create_shoping_list(user)
-        response = HttpResponse(
-            shopping_list, content_type="text.txt; charset=utf-8"
+        file_format = request.query_params.get(UrlQueries.FORMAT.value, "txt")
+        if file_format not in SHOPPING_LIST_CONTENT_TYPES:
+            return Response(
+                {"error": f"Формат {file_format} не поддерживается."},
+                status=HTTP_400_BAD_REQUEST,
+            )
+
+        if file_format == "pdf":
+            return self._pdf_job_response(
+                request, start_shopping_list_pdf(user)
+            )
+
+        return self._shopping_list_response(
+            request, create_shoping_list(user, file_format), file_format
+        )
+
+    @action(
+        methods=("get",),
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path=r"download_shopping_cart/(?P<job_id>[0-9a-f]{32})",
+        url_name="shopping-list-pdf",
+    )
+    def shopping_list_pdf(self, request, job_id):
+        """Отдаёт состояние задания на PDF, а когда он готов - сам файл."""
+        job = shopping_list_pdf_job(request.user, job_id)
+        if job is None:
+            return Response(status=HTTP_404_NOT_FOUND)
+
+        if job["status"] == JobStatus.PENDING:
+            return self._pdf_job_response(request, job_id)
+
+        if job["status"] == JobStatus.FAILED:
+            return Response(
+                {"status": job["status"]},
+                status=HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        content = read_shopping_list_pdf(job["file"])
+        if content is None:
+            return Response(status=HTTP_404_NOT_FOUND)
+        return self._shopping_list_response(request, content, "pdf")
+
+    def _pdf_job_response(self, request, job_id):
+        url = request.build_absolute_uri(
+            reverse(
+                "api:recipes-shopping-list-pdf", kwargs={"job_id": job_id}
+            )
+        )
+        return Response(
+            {"status": JobStatus.PENDING.value, "url": url},
+            status=HTTP_202_ACCEPTED,
+            headers={"Location": url},
+        )
+
+    def _shopping_list_response(self, request, content, file_format):
+        filename = f"{request.user.username}_shopping_list.{file_format}"
+        if isinstance(request._request, ASGIRequest):
+            content = iterate_async(content)
+        response = StreamingHttpResponse(
+            content, content_type=SHOPPING_LIST_CONTENT_TYPES[file_format]
         )
         response["Content-Disposition"] = f"attachment; filename={filename}"
         return response
@@ -0,0 +1,81 @@
+import json
+
+from django.contrib.admin import FieldListFilter
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from core.enums import Limits
+
+
+class AutocompleteFilter(FieldListFilter):
+    """Фильтр по внешнему ключу с поиском вместо списка значений.
+
+    Стандартный фильтр выводит в боковую панель все связанные объекты,
+    а этот - поле с автодополнением через `autocomplete_view` админки.
+    В админке связанной модели должны быть заданы `search_fields`.
+    """
+
+    template = "admin/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        target = field.target_field.attname
+        self.lookup_kwarg = f"{field_path}__{target}__exact"
+        super().__init__(
+            field, request, params, model, model_admin, field_path
+        )
+        self.lookup_val = self.used_parameters.get(self.lookup_kwarg)
+
+        form_field = field.formfield(
+            required=False,
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+        )
+        self.widget_id = f"autocomplete_filter_{field_path}"
+        self.rendered_widget = form_field.widget.render(
+            self.lookup_kwarg,
+            self.lookup_val,
+            attrs={"id": self.widget_id, "style": "width: 100%"},
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        yield {
+            "selected": self.lookup_val is None,
+            "query_string": changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+            "display": _("All"),
+        }
+
+
+class AutocompleteFilterMixin:
+    """Подключает к списку объектов скрипты `AutocompleteFilter`."""
+
+    @property
+    def media(self):
+        return super().media + AutocompleteSelect(None, self.admin_site).media
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, который не считает `COUNT(*)` по большим таблицам.
+
+    В Postgres число строк сначала берётся из оценки планировщика
+    (`EXPLAIN`). Точный `COUNT(*)` выполняется, только если оценка
+    меньше `ADMIN_EXACT_COUNT_LIMIT`, то есть когда он дешёвый.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if connections[queryset.db].vendor != "postgresql":
+            return super().count
+
+        plan = json.loads(queryset.order_by().explain(format="json"))
+        estimate = int(plan[0]["Plan"]["Plan Rows"])
+        if estimate < Limits.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
@@ -0,0 +1,272 @@
+from collections import OrderedDict
+from hashlib import md5, sha256
+from threading import Lock
+from time import monotonic, time_ns
+
+from asgiref.sync import sync_to_async
+
+from django.apps import apps
+from django.core.cache import cache
+
+from foodgram.settings import (
+    RECIPES_CACHE_TIMEOUT,
+    TOKEN_CACHE_SHARED_TIMEOUT,
+    TOKEN_CACHE_SIZE,
+    TOKEN_CACHE_TTL,
+)
+
+
+class GenerationCache:
+    """Кеш ответов, сбрасываемый сменой поколений.
+
+    Ключ ответа содержит номера поколений всех данных, от которых
+    ответ зависит. Чтобы сбросить часть кеша, достаточно увеличить
+    номер нужного поколения: старые ключи больше не запрашиваются и
+    сами истекают по таймауту. Поколения видны другим процессам,
+    только если бэкенд общий (Redis, Memcached), см. `core.checks`.
+    """
+
+    def __init__(self, prefix, timeout):
+        self.prefix = prefix
+        self.timeout = timeout
+        self.cache = cache
+
+    def get(self, generations, params):
+        """Возвращает закешированное значение или `None`."""
+        key = self._key(generations, params)
+        value = self.cache.get(key)
+        self._count("hits" if value is not None else "misses")
+        return key, value
+
+    async def aget(self, generations, params):
+        """Асинхронный `get` для обработчиков под ASGI.
+
+        Бэкенды кеша Django синхронные, их `aget` и остальные
+        асинхронные методы - обёртки `sync_to_async`. Поэтому весь `get`
+        выполняется за один переход в поток, а не за один на каждое
+        обращение к кешу.
+        """
+        return await sync_to_async(self.get)(generations, params)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    async def aset(self, key, value):
+        await sync_to_async(self.set)(key, value)
+
+    def bump(self, *generations):
+        """Делает недействительными ответы, зависящие от `generations`.
+
+        Номер поколения - время смены в наносекундах, поэтому его же
+        можно отдавать клиентам как время последнего изменения.
+        """
+        self.cache.set_many(
+            {
+                self._generation_key(generation): time_ns()
+                for generation in generations
+            },
+            None,
+        )
+
+    def generations(self, *generations):
+        """Возвращает текущие номера поколений, создавая недостающие."""
+        keys = [self._generation_key(generation) for generation in generations]
+        values = self.cache.get_many(keys)
+        for key in keys:
+            if key not in values:
+                self.cache.add(key, time_ns(), None)
+                values[key] = self.cache.get(key)
+
+        return tuple(values[key] for key in keys)
+
+    async def agenerations(self, *generations):
+        return await sync_to_async(self.generations)(*generations)
+
+    def stats(self):
+        """Число попаданий и промахов `get` с последнего сброса."""
+        counters = self.cache.get_many(
+            (f"{self.prefix}:hits", f"{self.prefix}:misses")
+        )
+        return {
+            "hits": counters.get(f"{self.prefix}:hits", 0),
+            "misses": counters.get(f"{self.prefix}:misses", 0),
+        }
+
+    def reset_stats(self):
+        self.cache.delete_many(
+            (f"{self.prefix}:hits", f"{self.prefix}:misses")
+        )
+
+    def _key(self, generations, params):
+        return self._make_key(self.generations(*generations), params)
+
+    def _make_key(self, versions, params):
+        raw = repr((versions, params))
+        return f"{self.prefix}:{md5(raw.encode()).hexdigest()}"
+
+    def _generation_key(self, generation):
+        return f"{self.prefix}:generation:{generation}"
+
+    def _count(self, counter):
+        key = f"{self.prefix}:{counter}"
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 1, None)
+
+
+class TokenCache:
+    """Кеш `токен -> снимок пользователя` для аутентификации.
+
+    Первый уровень - LRU в памяти процесса на `size` записей, каждая
+    живёт не дольше `ttl` секунд. Второй, необязательный, уровень -
+    общий кеш Django с таймаутом `shared_timeout` (0 - выключен), в
+    нём ключом служит хеш токена, а не сам токен. Снимок - кортеж
+    значений полей, поэтому каждый запрос получает свой экземпляр.
+
+    `invalidate` и `invalidate_user` сразу очищают память текущего
+    процесса и общий кеш; в остальных процессах запись доживает не
+    дольше `ttl`.
+    """
+
+    def __init__(self, size, ttl, shared_timeout):
+        self.size = size
+        self.ttl = ttl
+        self.shared_timeout = shared_timeout
+        self.cache = cache
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        """Возвращает снимок для токена `key` или `None`."""
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                del self._entries[key]
+
+        if not self.shared_timeout:
+            return None
+        snapshot = self.cache.get(self._shared_key(key))
+        if snapshot is not None:
+            self._remember(key, snapshot, now)
+        return snapshot
+
+    def set(self, key, snapshot):
+        self._remember(key, snapshot, monotonic())
+        if self.shared_timeout:
+            self.cache.set(
+                self._shared_key(key), snapshot, self.shared_timeout
+            )
+
+    def invalidate(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.shared_timeout and keys:
+            self.cache.delete_many([self._shared_key(key) for key in keys])
+
+    def invalidate_user(self, user_id):
+        """Убирает из кеша все токены пользователя `user_id`."""
+        with self._lock:
+            keys = {
+                key
+                for key, (_, snapshot) in self._entries.items()
+                if snapshot[0] == user_id
+            }
+        if self.shared_timeout:
+            Token = apps.get_model("authtoken", "Token")
+            keys.update(
+                Token.objects.filter(user_id=user_id).values_list(
+                    "key", flat=True
+                )
+            )
+        self.invalidate(*keys)
+
+    def _remember(self, key, snapshot, now):
+        with self._lock:
+            self._entries[key] = (now + self.ttl, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _shared_key(key):
+        return f"token:v2:{sha256(key.encode()).hexdigest()}"
+
+
+recipes_cache = GenerationCache("recipes", RECIPES_CACHE_TIMEOUT)
+reference_cache = GenerationCache("reference", None)
+token_cache = TokenCache(
+    TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL, TOKEN_CACHE_SHARED_TIMEOUT
+)
+
+
+def recipe_list_generations(author_id=None, tags=()):
+    """Поколения, от которых зависит список рецептов с фильтрами.
+
+    Список без фильтров меняется при изменении любого рецепта, а список
+    с фильтрами - только при изменении рецептов его автора или тегов.
+    """
+    if author_id is None and not tags:
+        return ("epoch", "list")
+
+    generations = ["epoch"]
+    if author_id is not None:
+        generations.append(f"author:{author_id}")
+    generations.extend(f"tag:{slug}" for slug in tags)
+    return tuple(generations)
+
+
+def recipe_detail_generations(recipe_id):
+    return ("epoch", f"recipe:{recipe_id}")
+
+
+def changed_recipe_generations(recipe_id, author_ids=(), tags=()):
+    """Поколения, которые надо сменить при изменении рецепта."""
+    return (
+        f"recipe:{recipe_id}",
+        "list",
+        *(f"author:{author_id}" for author_id in author_ids if author_id),
+        *(f"tag:{slug}" for slug in tags),
+    )
+
+
+def bump_recipe(recipe_id, author_ids=()):
+    """Сбрасывает кеш рецепта, его авторов и текущих тегов."""
+    Tag = apps.get_model("recipes", "Tag")
+    tags = Tag.objects.filter(recipes=recipe_id).values_list("slug", flat=True)
+    recipes_cache.bump(
+        *changed_recipe_generations(recipe_id, author_ids, tags)
+    )
+
+
+def bump_author(author_id):
+    """Сбрасывает кеш ответов с данными автора.
+
+    Меняются поколение автора, страницы его рецептов, а также общий
+    список и списки по тегам этих рецептов, если рецепты есть.
+    """
+    Recipe = apps.get_model("recipes", "Recipe")
+    Tag = apps.get_model("recipes", "Tag")
+    recipe_ids = list(
+        Recipe.objects.filter(author_id=author_id).values_list("pk", flat=True)
+    )
+    generations = [f"author:{author_id}"]
+    if recipe_ids:
+        tags = (
+            Tag.objects.filter(recipes__author_id=author_id)
+            .values_list("slug", flat=True)
+            .distinct()
+        )
+        generations.extend(
+            (
+                "list",
+                *(f"recipe:{recipe_id}" for recipe_id in recipe_ids),
+                *(f"tag:{slug}" for slug in tags),
+            )
+        )
+    recipes_cache.bump(*generations)
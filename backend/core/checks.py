@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+from foodgram.settings import WEB_WORKERS
+
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def shared_cache_check(app_configs, **kwargs):
+    """Требует общий кеш, если приложение работает в нескольких процессах.
+
+    Через кеш воркеры узнают о сменах поколений, версий справочников
+    и о недавних записях клиента. С кешем в памяти процесса изменение
+    в одном воркере не видно остальным до перезапуска.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    if WEB_WORKERS > 1 and backend in PROCESS_LOCAL_CACHES:
+        return [
+            Error(
+                f"{backend} не общий для {WEB_WORKERS} воркеров.",
+                hint=(
+                    "Укажите CACHE_BACKEND=django.core.cache.backends."
+                    "redis.RedisCache и CACHE_LOCATION=redis://..., "
+                    "или WEB_WORKERS=1."
+                ),
+                id="core.E001",
+            )
+        ]
+    return []
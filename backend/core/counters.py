@@ -0,0 +1,120 @@
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+RECIPE_COUNTERS = {
+    "favorites_count": ("recipes", "Favorite", "recipe"),
+    "carts_count": ("recipes", "Carts", "recipe"),
+}
+USER_COUNTERS = {
+    "recipes_count": ("recipes", "Recipe", "author"),
+    "subscribers_count": ("users", "Subscription", "author"),
+}
+
+
+class CounterFieldsMixin:
+    """Не даёт обычному `save()` перезаписать счётчики.
+
+    Счётчики меняются только через `change_counter`, а экземпляр
+    модели мог быть загружен до этого, поэтому при сохранении
+    существующей строки они исключаются из `update_fields`.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and not self._state.adding
+            and not kwargs.get("force_insert")
+            and kwargs.get("update_fields") is None
+        ):
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно меняет счётчик `field` у строки `pk` на `delta`.
+
+    Изменение делается одним `UPDATE ... SET field = field + delta`,
+    поэтому параллельные запросы не теряют обновлений. Счётчик не
+    уходит ниже нуля, даже если он уже разошёлся с данными.
+    """
+    return change_counters(model, (pk,), field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    """Как `change_counter`, но для всех строк `pks` одним `UPDATE`."""
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field}__gte": -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def recipe_counter(link_model):
+    """Возвращает счётчик рецепта, который считает связи `link_model`."""
+    opts = link_model._meta
+    return next(
+        field
+        for field, (app, name, _) in RECIPE_COUNTERS.items()
+        if (app, name) == (opts.app_label, opts.object_name)
+    )
+
+
+def recount(model, counters, apps=global_apps, pks=None):
+    """Пересчитывает счётчики `model` и возвращает число исправленных строк.
+
+    Перезаписываются только строки, где счётчик разошёлся с числом
+    связанных объектов. `pks` ограничивает пересчёт этими строками,
+    `apps` позволяет вызывать функцию из миграций.
+    """
+    queryset = model.objects.all()
+    if pks is not None:
+        queryset = queryset.filter(pk__in=pks)
+
+    actual = {
+        field: _count_related(apps.get_model(app, name), related_field)
+        for field, (app, name, related_field) in counters.items()
+    }
+    mismatched = Q()
+    for field in counters:
+        mismatched |= ~Q(**{field: F(f"actual_{field}")})
+
+    mismatched_pks = (
+        queryset.annotate(
+            **{f"actual_{field}": value for field, value in actual.items()}
+        )
+        .filter(mismatched)
+        .values("pk")
+    )
+    return model.objects.filter(pk__in=Subquery(mismatched_pks)).update(
+        **actual
+    )
+
+
+def recount_recipes(apps=global_apps, pks=None):
+    return recount(
+        apps.get_model("recipes", "Recipe"), RECIPE_COUNTERS, apps, pks
+    )
+
+
+def recount_users(apps=global_apps):
+    return recount(apps.get_model("users", "MyUser"), USER_COUNTERS, apps)
+
+
+def _count_related(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(count=Count("pk"))
+            .values("count")
+        ),
+        Value(0),
+    )
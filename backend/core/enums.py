@@ -3,8 +3,11 @@ from enum import Enum, IntEnum
 
 class Tuples(tuple, Enum):
     RECIPE_IMAGE_SIZE = 500, 500
+    RECIPE_IMAGE_RENDITIONS = 250, 500, 1000
     SYMBOL_TRUE_SEARCH = "1", "true"
     SYMBOL_FALSE_SEARCH = "0", "false"
+    RECIPES_ORDERING = "pub_date", "favorites_count", "carts_count"
+    AUTHORS_ORDERING = "recipes_count", "subscribers_count"
 
 
 class Limits(IntEnum):
@@ -18,6 +21,14 @@ class Limits(IntEnum):
     MAX_COOKING_TIME = 300
     MIN_AMOUNT_INGREDIENTS = 1
     MAX_AMOUNT_INGREDIENTS = 32
+    PAGE_SIZE = 6
+    MAX_PAGE_SIZE = 100
+    INGREDIENTS_SEARCH_LIMIT = 50
+    MIN_TRIGRAM_QUERY = 3
+    MAX_IMAGE_BYTES = 10 * 1024 * 1024
+    MAX_IMAGE_PIXELS = 50_000_000
+    ADMIN_EXACT_COUNT_LIMIT = 10_000
+    MAX_BATCH_SIZE = 100
 
 
 class UrlQueries(str, Enum):
@@ -26,3 +37,24 @@ class UrlQueries(str, Enum):
     SHOP_CART = "is_in_shopping_cart"
     AUTHOR = "author"
     TAGS = "tags"
+    PAGE = "page"
+    LIMIT = "limit"
+    CURSOR = "cursor"
+    RECIPES_LIMIT = "recipes_limit"
+    FORMAT = "format"
+    ORDERING = "ordering"
+    SEARCH = "search"
+
+
+class RelationStatus(str, Enum):
+    CREATED = "created"
+    DELETED = "deleted"
+    EXISTS = "exists"
+    MISSING = "missing"
+    NOT_FOUND = "not_found"
+
+
+class JobStatus(str, Enum):
+    PENDING = "pending"
+    READY = "ready"
+    FAILED = "failed"
@@ -0,0 +1,183 @@
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from heapq import merge
+from itertools import islice
+
+from django.apps import apps
+from django.db import connections
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from foodgram.settings import FEED_FANOUT_LIMIT, FEED_MAX_ENTRIES, FEED_WORKERS
+
+logger = logging.getLogger(__name__)
+
+FANOUT_BATCH_SIZE = 1000
+
+FeedItem = namedtuple("FeedItem", ("pub_date", "id"))
+
+feed_executor = ThreadPoolExecutor(
+    max_workers=FEED_WORKERS, thread_name_prefix="feed"
+)
+
+
+def schedule(function, *args):
+    """Отправляет заполнение лент в фоновый пул."""
+    return feed_executor.submit(_run_in_background, function, *args)
+
+
+def fan_out_recipe(recipe_id):
+    """Добавляет рецепт в ленты подписчиков автора.
+
+    Подписчики обрабатываются пачками по `FANOUT_BATCH_SIZE`, после
+    каждой пачки их ленты обрезаются до `FEED_MAX_ENTRIES`. Рецепты
+    авторов, у которых подписчиков больше `FEED_FANOUT_LIMIT`, в
+    ленты не пишутся - они подмешиваются при чтении в `feed_page`.
+    """
+    Recipe = apps.get_model("recipes", "Recipe")
+    FeedEntry = apps.get_model("recipes", "FeedEntry")
+    Subscription = apps.get_model("users", "Subscription")
+
+    recipe = (
+        Recipe.objects.filter(pk=recipe_id)
+        .values("author_id", "pub_date", "author__subscribers_count")
+        .first()
+    )
+    if (
+        recipe is None
+        or recipe["author_id"] is None
+        or recipe["author__subscribers_count"] > FEED_FANOUT_LIMIT
+    ):
+        return
+
+    subscribers = (
+        Subscription.objects.filter(author_id=recipe["author_id"])
+        .values_list("user_id", flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    while user_ids := list(islice(subscribers, FANOUT_BATCH_SIZE)):
+        FeedEntry.objects.bulk_create(
+            (
+                FeedEntry(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    pub_date=recipe["pub_date"],
+                )
+                for user_id in user_ids
+            ),
+            ignore_conflicts=True,
+        )
+        trim_feeds(user_ids)
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние рецепты автора."""
+    Recipe = apps.get_model("recipes", "Recipe")
+    FeedEntry = apps.get_model("recipes", "FeedEntry")
+    User = apps.get_model("users", "MyUser")
+
+    if User.objects.filter(
+        pk=author_id, subscribers_count__gt=FEED_FANOUT_LIMIT
+    ).exists():
+        return
+
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        "-pub_date", "-id"
+    )[:FEED_MAX_ENTRIES]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+            for pk, pub_date in recipes.values_list("pk", "pub_date")
+        ),
+        ignore_conflicts=True,
+    )
+    trim_feeds((user_id,))
+
+
+def trim_feeds(user_ids):
+    """Оставляет в лентах `user_ids` только `FEED_MAX_ENTRIES` записей."""
+    FeedEntry = apps.get_model("recipes", "FeedEntry")
+    stale = list(
+        FeedEntry.objects.filter(user_id__in=user_ids)
+        .annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F("user"),
+                order_by=(F("pub_date").desc(), F("recipe").desc()),
+            )
+        )
+        .filter(position__gt=FEED_MAX_ENTRIES)
+        .values_list("pk", flat=True)
+    )
+    if stale:
+        FeedEntry.objects.filter(pk__in=stale).delete()
+
+
+def feed_page(user, limit, before=None):
+    """Возвращает страницу ленты и признак того, что есть продолжение.
+
+    Страница - до `limit` пар `(pub_date, id)` рецептов, опубликованных
+    раньше позиции `before`. Своя лента читается одним проходом по
+    индексу `(user, -pub_date, -recipe)`. Рецепты авторов, которым
+    лента не рассылается, выбираются по индексу рецептов автора и
+    сливаются с ней по дате.
+    """
+    FeedEntry = apps.get_model("recipes", "FeedEntry")
+    Recipe = apps.get_model("recipes", "Recipe")
+    Subscription = apps.get_model("users", "Subscription")
+
+    timeline = (
+        FeedEntry.objects.filter(user=user)
+        .filter(_before(before, "recipe_id"))
+        .order_by("-pub_date", "-recipe")
+        .values_list("pub_date", "recipe_id")[: limit + 1]
+    )
+    rows = map(FeedItem._make, timeline)
+
+    popular_authors = list(
+        Subscription.objects.filter(
+            user=user, author__subscribers_count__gt=FEED_FANOUT_LIMIT
+        ).values_list("author_id", flat=True)
+    )
+    if popular_authors:
+        recent = (
+            Recipe.objects.filter(author__in=popular_authors)
+            .filter(_before(before, "id"))
+            .order_by("-pub_date", "-id")
+            .values_list("pub_date", "id")[: limit + 1]
+        )
+        rows = _unique(
+            merge(rows, map(FeedItem._make, recent), reverse=True)
+        )
+
+    page = list(islice(rows, limit + 1))
+    return page[:limit], len(page) > limit
+
+
+def _before(position, id_field):
+    if position is None:
+        return Q()
+
+    pub_date, pk = position
+    return Q(pub_date__lt=pub_date) | Q(
+        pub_date=pub_date, **{f"{id_field}__lt": pk}
+    )
+
+
+def _unique(items):
+    seen = set()
+    for item in items:
+        if item.id not in seen:
+            seen.add(item.id)
+            yield item
+
+
+def _run_in_background(function, *args):
+    try:
+        return function(*args)
+    except Exception:
+        logger.exception("Не удалось обновить ленты: %s%s", function, args)
+        raise
+    finally:
+        connections.close_all()
@@ -0,0 +1,136 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+
+from PIL import Image
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+
+from core.cache import bump_recipe
+from core.enums import Tuples
+from foodgram.settings import IMAGE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = "recipe_images/renditions"
+EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp"}
+LARGEST_SIZE = max(
+    *Tuples.RECIPE_IMAGE_RENDITIONS, *Tuples.RECIPE_IMAGE_SIZE
+)
+
+image_executor = ThreadPoolExecutor(
+    max_workers=IMAGE_WORKERS, thread_name_prefix="recipe-images"
+)
+
+
+def schedule_renditions(recipe_id, image_name):
+    """Отправляет обработку картинки рецепта в фоновый пул."""
+    return image_executor.submit(process_recipe_image, recipe_id, image_name)
+
+
+def process_recipe_image(recipe_id, image_name):
+    """Строит уменьшенные копии картинки и сохраняет их в рецепт.
+
+    Для каждого размера из `RECIPE_IMAGE_RENDITIONS` создаются копия
+    в исходном формате и WebP. Имена файлов содержат хеш содержимого,
+    поэтому их можно кешировать без ограничения срока. После этого
+    сам оригинал ужимается до `RECIPE_IMAGE_SIZE`. JPEG читается в
+    режиме `draft`, то есть сразу уменьшенным при декодировании.
+    """
+    Recipe = apps.get_model("recipes", "Recipe")
+    try:
+        try:
+            with default_storage.open(image_name) as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+
+        digest = image_digest(data)
+        with Image.open(BytesIO(data)) as image:
+            original_format = image.format or "PNG"
+            if original_format == "JPEG":
+                image.draft(None, (LARGEST_SIZE, LARGEST_SIZE))
+            image.load()
+            renditions = {
+                str(size): _save_renditions(
+                    image, size, f"{recipe_id}/{digest}", original_format
+                )
+                for size in Tuples.RECIPE_IMAGE_RENDITIONS
+            }
+
+            if max(image.size) > max(Tuples.RECIPE_IMAGE_SIZE):
+                image.thumbnail(Tuples.RECIPE_IMAGE_SIZE)
+                image.save(default_storage.path(image_name), original_format)
+
+        old_renditions = (
+            Recipe.objects.filter(pk=recipe_id)
+            .values_list("image_renditions", flat=True)
+            .first()
+        )
+        updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+            image_renditions=renditions
+        )
+        if updated:
+            delete_renditions(old_renditions, keep=renditions)
+            bump_recipe(recipe_id)
+        else:
+            delete_renditions(renditions)
+        return renditions
+    except Exception:
+        logger.exception("Не удалось обработать картинку %s", image_name)
+        raise
+    finally:
+        connections.close_all()
+
+
+def image_digest(data):
+    return sha256(data).hexdigest()[:16]
+
+
+def is_same_image(renditions, file):
+    """Проверяет, что из `file` уже построены копии `renditions`.
+
+    Имена копий содержат хеш исходного файла, поэтому повторно
+    присланную ту же картинку можно узнать без чтения хранилища.
+    """
+    digest = image_digest(file.read())
+    file.seek(0)
+    return any(
+        f"/{digest}_" in name for name in _rendition_names(renditions)
+    )
+
+
+def delete_renditions(renditions, keep=None):
+    keep_names = set(_rendition_names(keep))
+    for name in _rendition_names(renditions):
+        if name not in keep_names:
+            default_storage.delete(name)
+
+
+def _rendition_names(renditions):
+    for formats in (renditions or {}).values():
+        yield from formats.values()
+
+
+def _save_renditions(image, size, prefix, original_format):
+    copy = image.copy()
+    copy.thumbnail((size, size))
+
+    names = {}
+    for image_format in (original_format, "WEBP"):
+        if image_format == "JPEG" and copy.mode not in ("RGB", "L"):
+            copy = copy.convert("RGB")
+        extension = EXTENSIONS.get(image_format, image_format.lower())
+        buffer = BytesIO()
+        copy.save(buffer, image_format)
+
+        name = f"{RENDITIONS_DIR}/{prefix}_{size}.{extension}"
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        names[image_format.lower()] = name
+
+    return names
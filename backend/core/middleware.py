@@ -0,0 +1,245 @@
+import logging
+from contextvars import ContextVar
+from hashlib import sha256
+from heapq import heappush, heappushpop
+from random import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from core.routers import allow_replicas, reset_replicas
+from foodgram.settings import (
+    DB_REPLICA_STICKY_SECONDS,
+    SQL_INSTRUMENTATION_SAMPLE_RATE,
+    SQL_INSTRUMENTATION_SLOWEST,
+    SQL_INSTRUMENTATION_SQL_LENGTH,
+)
+
+logger = logging.getLogger(__name__)
+
+_recorder = ContextVar("sql_recorder", default=None)
+
+
+class QueryRecorder:
+    """Обёртка `execute_wrapper`, собирающая статистику запросов к БД.
+
+    Хранит число запросов, суммарное время и `slowest` самых долгих
+    запросов. При `keep_sql` запоминает текст всех запросов.
+    """
+
+    def __init__(self, slowest, keep_sql=False):
+        self.slowest = slowest
+        self.count = 0
+        self.duration = 0.0
+        self.slow = []
+        self.statements = [] if keep_sql else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.count += 1
+            self.duration += duration
+            if self.slowest:
+                entry = (duration, self.count, sql)
+                if len(self.slow) < self.slowest:
+                    heappush(self.slow, entry)
+                else:
+                    heappushpop(self.slow, entry)
+            if self.statements is not None:
+                self.statements.append(
+                    f"{duration * 1000:.1f}ms {sql} {params!r}"
+                )
+
+
+class SQLInstrumentationMiddleware:
+    """Пишет одну строку лога со статистикой БД на каждый запрос.
+
+    В строке: метод, путь, статус, число запросов, время в БД и общее
+    время, а также самые долгие запросы, обрезанные до
+    `SQL_INSTRUMENTATION_SQL_LENGTH` символов. Для доли запросов
+    `SQL_INSTRUMENTATION_SAMPLE_RATE` в строку попадают все запросы
+    целиком с параметрами. Запросы учитываются во всех подключениях.
+
+    Обёртка `execute_wrapper` ставится на каждое подключение один раз -
+    при его открытии или в начале запроса в потоке, где выполняется
+    представление, - и пишет в `QueryRecorder` текущего запроса из
+    `ContextVar`. Так учитываются и запросы, которые в режиме ASGI
+    выполняются в потоках `sync_to_async`, а асинхронная цепочка
+    middleware не переводится в синхронный режим.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(
+            _instrument_connection, dispatch_uid="sql_instrumentation"
+        )
+        request_started.connect(
+            _instrument_connections, dispatch_uid="sql_instrumentation"
+        )
+        _instrument_connections()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder, token = self._start()
+        started = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self._log(request, response, recorder, perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        recorder, token = self._start()
+        started = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        self._log(request, response, recorder, perf_counter() - started)
+        return response
+
+    @staticmethod
+    def _start():
+        recorder = QueryRecorder(
+            SQL_INSTRUMENTATION_SLOWEST,
+            keep_sql=random() < SQL_INSTRUMENTATION_SAMPLE_RATE,
+        )
+        return recorder, _recorder.set(recorder)
+
+    @staticmethod
+    def _log(request, response, recorder, elapsed):
+        logger.info(
+            "%s %s %s queries=%d db=%.1fms total=%.1fms%s%s",
+            request.method,
+            request.path,
+            response.status_code,
+            recorder.count,
+            recorder.duration * 1000,
+            elapsed * 1000,
+            _format_slowest(recorder.slow),
+            _format_sampled(recorder.statements),
+        )
+
+
+class ReplicaRoutingMiddleware:
+    """Решает, можно ли запросу читать с реплик БД.
+
+    Реплики разрешены `GET`, `HEAD` и `OPTIONS`. После изменяющего
+    запроса клиент с тем же заголовком `Authorization`
+    `DB_REPLICA_STICKY_SECONDS` секунд читает только основную БД и
+    видит свои изменения, даже если реплика отстаёт. Отметка хранится
+    в кеше, поэтому между воркерами она работает только с общим
+    `CACHE_BACKEND`. Разрешение хранится в `ContextVar` и в режиме ASGI
+    доходит до потоков `sync_to_async`, поэтому у middleware есть
+    асинхронная ветка.
+    """
+
+    sync_capable = True
+    async_capable = True
+    safe_methods = ("GET", "HEAD", "OPTIONS")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        sticky_key = self._sticky_key(request)
+        sticky = (
+            sticky_key is not None
+            and request.method in self.safe_methods
+            and cache.get(sticky_key)
+        )
+        token = allow_replicas(self._allowed(request, sticky))
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_replicas(token)
+
+        if request.method not in self.safe_methods and sticky_key:
+            cache.set(sticky_key, True, DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        sticky_key = self._sticky_key(request)
+        sticky = (
+            sticky_key is not None
+            and request.method in self.safe_methods
+            and await cache.aget(sticky_key)
+        )
+        token = allow_replicas(self._allowed(request, sticky))
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_replicas(token)
+
+        if request.method not in self.safe_methods and sticky_key:
+            await cache.aset(sticky_key, True, DB_REPLICA_STICKY_SECONDS)
+        return response
+
+    def _allowed(self, request, sticky):
+        return request.method in self.safe_methods and not sticky
+
+    @staticmethod
+    def _sticky_key(request):
+        authorization = request.headers.get("Authorization")
+        if not authorization:
+            return None
+        return f"db:primary:{sha256(authorization.encode()).hexdigest()}"
+
+
+def _instrument_connection(sender=None, connection=None, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _instrument_connections(**kwargs):
+    for connection in connections.all(initialized_only=True):
+        _instrument_connection(connection=connection)
+
+
+def _record_query(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def _format_slowest(slow):
+    if not slow:
+        return ""
+    return " slowest=" + " | ".join(
+        f"{duration * 1000:.1f}ms "
+        f"{_shorten(sql, SQL_INSTRUMENTATION_SQL_LENGTH)}"
+        for duration, _, sql in sorted(slow, reverse=True)
+    )
+
+
+def _format_sampled(statements):
+    if not statements:
+        return ""
+    return " sql=" + " | ".join(statements)
+
+
+def _shorten(sql, length):
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= length else sql[: length - 1] + "…"
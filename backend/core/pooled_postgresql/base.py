@@ -0,0 +1,128 @@
+import os
+from collections import deque
+from threading import Lock
+from time import monotonic
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.base import IsolationLevel
+
+IDLE = 0
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CHECK_AFTER = 30
+
+
+class ConnectionPool:
+    """Простой пул открытых соединений psycopg одного процесса.
+
+    Хранит до `size` свободных соединений вместе со временем, когда
+    они были возвращены. Новые соединения пул не создаёт: их создаёт
+    бэкенд, когда свободных нет.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._idle = deque()
+        self._lock = Lock()
+
+    def take(self):
+        with self._lock:
+            return self._idle.pop() if self._idle else (None, None)
+
+    def put(self, connection):
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append((connection, monotonic()))
+                return True
+        return False
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _ in idle:
+            connection.close()
+
+
+_pools = {}
+_pools_lock = Lock()
+
+
+def get_pool(alias, size):
+    """Пул для `alias` в текущем процессе; после fork создаётся новый."""
+    key = (os.getpid(), alias)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, ConnectionPool(size))
+    return pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Бэкенд PostgreSQL, который возвращает соединения в пул.
+
+    `close()` в конце запроса кладёт соединение без открытой
+    транзакции в пул процесса, а следующее подключение в любом потоке
+    берёт его оттуда вместо нового `connect()`. Нужен потоковым и
+    ASGI-воркерам, где `CONN_MAX_AGE` не помогает: соединение там
+    привязано к потоку, а поток - к одному запросу.
+
+    Настройки в `DATABASES`: `POOL_SIZE` - сколько свободных соединений
+    держать, `POOL_CHECK_AFTER` - через сколько секунд простоя
+    проверять соединение запросом `SELECT 1`, если включены
+    `CONN_HEALTH_CHECKS`.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(
+            self.alias, self.settings_dict.get("POOL_SIZE", DEFAULT_POOL_SIZE)
+        )
+
+    def get_new_connection(self, conn_params):
+        while True:
+            connection, returned_at = self.pool.take()
+            if connection is None:
+                return super().get_new_connection(conn_params)
+            if self._is_reusable(connection, returned_at):
+                self.isolation_level = IsolationLevel(
+                    self.settings_dict["OPTIONS"].get(
+                        "isolation_level", IsolationLevel.READ_COMMITTED
+                    )
+                )
+                return connection
+            connection.close()
+
+    def _close(self):
+        connection = self.connection
+        if (
+            connection is not None
+            and not self.in_atomic_block
+            and not self.errors_occurred
+            and not connection.closed
+        ):
+            try:
+                if connection.info.transaction_status != IDLE:
+                    connection.rollback()
+            except self.Database.Error:
+                pass
+            else:
+                if self.pool.put(connection):
+                    return None
+        return super()._close()
+
+    def _is_reusable(self, connection, returned_at):
+        if connection.closed or connection.info.transaction_status != IDLE:
+            return False
+        check_after = self.settings_dict.get(
+            "POOL_CHECK_AFTER", DEFAULT_CHECK_AFTER
+        )
+        if (
+            not self.settings_dict["CONN_HEALTH_CHECKS"]
+            or monotonic() - returned_at < check_after
+        ):
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+        except self.Database.Error:
+            return False
+        return True
@@ -0,0 +1,110 @@
+from collections import namedtuple
+from sys import intern
+from threading import Lock
+
+from core.cache import reference_cache
+from core.routers import use_primary
+
+
+class ReferenceRegistry:
+    """Копия справочной таблицы в памяти процесса: `id -> запись`.
+
+    Записи - именованные кортежи из `fields` с общими (`intern`)
+    строками, поэтому весь справочник ингредиентов занимает в воркере
+    около половины мегабайта. Версия справочника хранится в общем кеше и
+    меняется сигналами после коммита, так что изменение в одном
+    воркере приводит к перечитыванию таблицы во всех остальных при
+    следующем обращении. Если новая версия до воркера не дошла,
+    запрос `id`, которого нет в реестре, но есть в БД, тоже
+    перечитывает таблицу.
+    """
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = fields
+        self.record = namedtuple(model.__name__, fields)
+        self._lock = Lock()
+        self._state = (None, {}, {})
+
+    def records(self):
+        return self._load()[1]
+
+    def _load(self, stale=None):
+        (version,) = reference_cache.generations(self.model._meta.model_name)
+        state = self._state
+        if state[0] == version and state is not stale:
+            return state
+
+        with self._lock:
+            state = self._state
+            if state[0] != version or state is stale:
+                with use_primary():
+                    rows = self.model.objects.order_by("pk").values_list(
+                        "pk", *self.fields
+                    )
+                    records = {
+                        pk: self.record._make(
+                            intern(value) if isinstance(value, str) else value
+                            for value in values
+                        )
+                        for pk, *values in rows
+                    }
+                state = self._state = (version, records, {})
+        return state
+
+    def get(self, pk):
+        return self._load_with((pk,))[1].get(pk)
+
+    def _load_with(self, pks):
+        """Возвращает состояние реестра, перечитав таблицу при промахе."""
+        state = self._load()
+        missing = [pk for pk in pks if pk not in state[1]]
+        if missing:
+            with use_primary():
+                found = self.model.objects.filter(pk__in=missing).exists()
+            if found:
+                state = self._load(stale=state)
+        return state
+
+    def instances(self, pks):
+        """Возвращает `{id: экземпляр модели}` для найденных `pks`.
+
+        Экземпляры собираются из записей без запроса к БД, создаются
+        один раз на версию справочника и общие для всех запросов,
+        поэтому изменять их нельзя. Они годятся для присваивания
+        внешним ключам, `set()` связей и сериализации.
+        """
+        pks = list(pks)
+        _, records, cached = self._load_with(pks)
+        instances = {}
+        for pk in pks:
+            instance = cached.get(pk)
+            if instance is None:
+                record = records.get(pk)
+                if record is None:
+                    continue
+                instance = cached[pk] = self.model.from_db(
+                    self.model.objects.db,
+                    (self.model._meta.pk.attname, *self.fields),
+                    (pk, *record),
+                )
+            instances[pk] = instance
+        return instances
+
+
+_registries = {}
+
+
+def get_registry(model):
+    """Возвращает реестр справочной модели `Tag` или `Ingredient`."""
+    registry = _registries.get(model)
+    if registry is None:
+        fields = tuple(
+            field.attname
+            for field in model._meta.concrete_fields
+            if not field.primary_key
+        )
+        registry = _registries.setdefault(
+            model, ReferenceRegistry(model, fields)
+        )
+    return registry
@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from random import choice
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from foodgram.settings import DATABASE_REPLICAS
+
+_replicas_allowed = ContextVar("replicas_allowed", default=False)
+
+
+class PrimaryReplicaRouter:
+    """Отправляет чтение на реплики, а запись - на основную БД.
+
+    Реплики используются, только пока это разрешено для текущего
+    контекста: `ReplicaRoutingMiddleware` разрешает их безопасным
+    запросам без недавней записи. Первая запись в запросе и любая
+    открытая транзакция возвращают чтение на основную БД, фоновые
+    задачи вне запросов всегда работают с ней.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            not DATABASE_REPLICAS
+            or not _replicas_allowed.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return choice(DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        _replicas_allowed.set(False)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def allow_replicas(allowed):
+    """Разрешает или запрещает реплики до `reset_replicas(token)`."""
+    return _replicas_allowed.set(allowed)
+
+
+def reset_replicas(token):
+    _replicas_allowed.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Читает из основной БД внутри блока.
+
+    Нужен там, где прочитанное кешируется по версии данных: реплика с
+    задержкой иначе попала бы в кеш под уже новой версией.
+    """
+    token = allow_replicas(False)
+    try:
+        yield
+    finally:
+        reset_replicas(token)
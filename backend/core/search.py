@@ -0,0 +1,181 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from django.apps import apps
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import connections
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+from django.db.models.functions import Greatest
+
+from core.enums import Limits
+from core.registry import get_registry
+from core.services import maybe_wrong_layout
+
+RECIPE_SEARCH_CONFIG = "russian"
+
+
+class IngredientIndex:
+    """Поисковый индекс ингредиентов в памяти процесса.
+
+    Справочник ингредиентов небольшой и почти не меняется, поэтому
+    он целиком держится в отсортированном списке названий. Совпадения
+    по началу названия ищутся бинарным поиском, по подстроке - через
+    `str.find` в склеенной строке всех названий. Индекс строится по
+    записям реестра ингредиентов и перестраивается, когда реестр
+    перечитывает таблицу.
+    """
+
+    separator = "\n"
+
+    def __init__(self):
+        self._entries = (None, None)
+
+    def search(self, query, limit=Limits.INGREDIENTS_SEARCH_LIMIT.value):
+        """Возвращает до `limit` ингредиентов, подходящих под `query`.
+
+        Запрос проверяется как есть и в исправленной раскладке.
+        Сначала идут совпадения по началу названия, затем по подстроке,
+        внутри каждой группы - в алфавитном порядке.
+        """
+        registry = get_registry(apps.get_model("recipes", "Ingredient"))
+        names, starts, text, pks = self._load(registry)
+        queries = tuple(
+            form for form in query_forms(query) if self.separator not in form
+        )
+        if not queries:
+            return []
+
+        prefix = set()
+        for form in queries:
+            start = bisect_left(names, form)
+            for idx in range(start, min(start + limit, len(names))):
+                if not names[idx].startswith(form):
+                    break
+                prefix.add(idx)
+
+        substring = set()
+        for form in queries:
+            found, pos = 0, text.find(form)
+            while pos != -1 and found < limit:
+                idx = bisect_right(starts, pos) - 1
+                if idx not in prefix:
+                    substring.add(idx)
+                    found += 1
+                pos = text.find(form, starts[idx + 1])
+
+        result = sorted(prefix) + sorted(substring)
+        return list(
+            registry.instances(pks[idx] for idx in result[:limit]).values()
+        )
+
+    def _load(self, registry):
+        records = registry.records()
+        source, entries = self._entries
+        if source is records:
+            return entries
+
+        rows = sorted(
+            (record.name.lower(), record.name, pk)
+            for pk, record in records.items()
+        )
+        names = [name for name, _, _ in rows]
+        starts = list(accumulate((len(name) + 1 for name in names), initial=0))
+        entries = (
+            names,
+            starts,
+            self.separator.join(names) + self.separator,
+            [pk for _, _, pk in rows],
+        )
+        self._entries = (records, entries)
+        return entries
+
+
+ingredient_index = IngredientIndex()
+
+
+def query_forms(query):
+    """Возвращает запрос как есть и в исправленной раскладке."""
+    return tuple(
+        dict.fromkeys(
+            form
+            for form in (query.strip().lower(), maybe_wrong_layout(query))
+            if form
+        )
+    )
+
+
+def fuzzy_search(
+    queryset, query, limit=Limits.INGREDIENTS_SEARCH_LIMIT.value
+):
+    """Ищет объекты по полю `name` с учётом опечаток.
+
+    В Postgres используется `pg_trgm`: отбор идёт оператором `<%`
+    по GIN-индексу, сортировка - сначала совпадения по началу
+    названия, затем по убыванию сходства. Запросы короче одной
+    триграммы ищутся только по началу названия. В остальных БД
+    (например, SQLite в тестах) - ранжированный `icontains`.
+    """
+    forms = query_forms(query)
+    if not forms:
+        return queryset.none()
+
+    is_prefix = Q()
+    for form in forms:
+        is_prefix |= Q(name__istartswith=form)
+    queryset = queryset.annotate(
+        is_prefix=ExpressionWrapper(is_prefix, output_field=BooleanField())
+    )
+
+    if connections[queryset.db].vendor != "postgresql":
+        matches = Q()
+        for form in forms:
+            matches |= Q(name__icontains=form)
+        return queryset.filter(matches).order_by("-is_prefix", "name")[:limit]
+
+    if max(len(form) for form in forms) < Limits.MIN_TRIGRAM_QUERY:
+        return queryset.filter(is_prefix=True).order_by("name")[:limit]
+
+    matches = Q()
+    similarities = []
+    for form in forms:
+        matches |= Q(name__trigram_word_similar=form)
+        similarities.append(TrigramWordSimilarity(form, "name"))
+    similarity = (
+        Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    )
+    return (
+        queryset.filter(matches)
+        .annotate(similarity=similarity)
+        .order_by("-is_prefix", "-similarity", "name")[:limit]
+    )
+
+
+def recipe_search(queryset, query):
+    """Полнотекстовый поиск рецептов по названию и описанию.
+
+    В Postgres запрос разбирается `websearch_to_tsquery` с русской
+    морфологией и сравнивается с колонкой `search_vector`, которую
+    заполняет триггер БД. Отбор идёт по GIN-индексу, название весит
+    больше описания, результаты сортируются по `ts_rank`. В остальных
+    БД - `icontains`, совпадения в названии идут первыми.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+
+    if connections[queryset.db].vendor != "postgresql":
+        in_name = Q(name__icontains=query)
+        rank = ExpressionWrapper(in_name, output_field=BooleanField())
+        queryset = queryset.filter(in_name | Q(text__icontains=query))
+    else:
+        search_query = SearchQuery(
+            query, config=RECIPE_SEARCH_CONFIG, search_type="websearch"
+        )
+        rank = SearchRank(F("search_vector"), search_query)
+        queryset = queryset.filter(search_vector=search_query)
+
+    return queryset.annotate(rank=rank).order_by("-rank", "-pub_date", "-id")
@@ -1,11 +1,47 @@
+import csv
+import json
+import logging
 from datetime import datetime as dt
+from itertools import islice
+from tempfile import SpooledTemporaryFile
 from urllib.parse import unquote
+from uuid import uuid4
+
+from asgiref.sync import sync_to_async
 
 from django.apps import apps
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, connections, router, transaction
 from django.db.models import F, Sum
+from django.db.models.signals import post_delete, post_save
+
+from core.counters import change_counters, recipe_counter
+from core.enums import JobStatus
+from core.images import image_executor
+from foodgram.settings import (
+    DATE_TIME_FORMAT,
+    PDF_FONT_PATH,
+    SHOPPING_LIST_PDF_TTL,
+)
+from recipes.models import AmountIngredient, Recipe
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+except ImportError:
+    canvas = None
+
+SHOPPING_LIST_CHUNK_SIZE = 2000
+ASYNC_STREAM_BATCH_SIZE = 500
+PDF_FONT_NAME = "ShoppingListFont"
+PDF_SPOOL_SIZE = 1024 * 1024
+SHOPPING_LISTS_DIR = "shopping_lists"
 
-from foodgram.settings import DATE_TIME_FORMAT
-from recipes.models import AmountIngredient
+logger = logging.getLogger(__name__)
 
 
 def recipe_ingredients_set(recipe, ingredients):
@@ -19,26 +55,471 @@ def recipe_ingredients_set(recipe, ingredients):
     AmountIngredient.objects.bulk_create(objects)
 
 
-def create_shoping_list(user):
-    shopping_list = [
-        f"Список покупок для:\n\n{user.first_name}\n"
-        f"{dt.now().strftime(DATE_TIME_FORMAT)}\n"
+def recipe_ingredients_update(recipe, ingredients):
+    """Приводит ингредиенты рецепта к `ingredients` по разнице.
+
+    Изменённые количества обновляются одним `bulk_update`, новые
+    строки добавляются одним `bulk_create`, удаляются только убранные
+    ингредиенты. Не больше четырёх запросов при любом составе.
+    """
+    amounts = {
+        ingredient.pk: (ingredient, amount)
+        for ingredient, amount in ingredients.values()
+    }
+    changed, removed = [], []
+    for row in AmountIngredient.objects.filter(recipe=recipe):
+        if row.ingredients_id not in amounts:
+            removed.append(row.pk)
+            continue
+
+        _, amount = amounts.pop(row.ingredients_id)
+        if row.amount != amount:
+            row.amount = amount
+            changed.append(row)
+
+    if removed:
+        AmountIngredient.objects.filter(pk__in=removed).delete()
+    if changed:
+        AmountIngredient.objects.bulk_update(changed, ("amount",))
+    if amounts:
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe=recipe, ingredients=ingredient, amount=amount
+            )
+            for ingredient, amount in amounts.values()
+        )
+
+
+def create_relation(link_model, user, target_id):
+    """Создаёт связь `user` с рецептом или автором `target_id`.
+
+    Связь вставляется одним `INSERT ... ON CONFLICT DO NOTHING
+    RETURNING`, поэтому повторный или параллельный запрос не падает на
+    уникальном ограничении, а просто получает `None`. Сигнал
+    `post_save` отправляется только для действительно созданной строки:
+    от него зависят счётчики и ленты подписок. Прочие нарушения
+    ограничений поднимают `IntegrityError`.
+    """
+    instance = link_model(
+        user=user, **{_relation_target(link_model).attname: target_id}
+    )
+    using = router.db_for_write(link_model, instance=instance)
+    connection = connections[using]
+    if not connection.features.can_return_columns_from_insert:
+        try:
+            with transaction.atomic(using=using):
+                instance.save(using=using)
+        except IntegrityError:
+            if not _relation(link_model, user, target_id).exists():
+                raise
+            return None
+        return instance
+
+    with transaction.atomic(using=using):
+        rows = _insert_relations(
+            link_model, (instance,), connection, link_model._meta.pk
+        )
+        if not rows:
+            return None
+
+        (row,) = rows
+        instance.pk = row[0]
+        instance._state.adding = False
+        instance._state.db = using
+        post_save.send(
+            sender=link_model,
+            instance=instance,
+            created=True,
+            update_fields=None,
+            raw=False,
+            using=using,
+        )
+    return instance
+
+
+def delete_relation(link_model, user, target_id):
+    """Удаляет связь `user` с рецептом или автором `target_id`.
+
+    Строка удаляется одним `DELETE ... RETURNING` без предварительного
+    `SELECT` и сборщика связанных объектов. Возвращает удалённую связь
+    или `None`, если её не было; `post_delete` отправляется только для
+    удалённой строки.
+    """
+    target = _relation_target(link_model)
+    target_id = target.target_field.get_prep_value(target_id)
+    using = router.db_for_write(link_model)
+    connection = connections[using]
+    if not connection.features.can_return_columns_from_insert:
+        instance = _relation(link_model, user, target_id).using(using).first()
+        if instance is not None:
+            instance.delete()
+        return instance
+
+    opts = link_model._meta
+    quote = connection.ops.quote_name
+    sql = (
+        f"DELETE FROM {quote(opts.db_table)} "
+        f"WHERE {quote(opts.get_field('user').column)} = %s "
+        f"AND {quote(target.column)} = %s "
+        f"RETURNING {quote(opts.pk.column)}"
+    )
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (user.pk, target_id))
+            row = cursor.fetchone()
+        if row is None:
+            return None
+
+        instance = link_model(
+            pk=row[0], user=user, **{target.attname: target_id}
+        )
+        instance._state.adding = False
+        instance._state.db = using
+        post_delete.send(
+            sender=link_model, instance=instance, using=using, origin=instance
+        )
+    return instance
+
+
+def _relation_target(link_model):
+    return next(
+        field
+        for field in link_model._meta.concrete_fields
+        if field.is_relation and field.name != "user"
+    )
+
+
+def _relation(link_model, user, target_id):
+    return link_model.objects.filter(
+        user=user, **{_relation_target(link_model).attname: target_id}
+    )
+
+
+def add_recipe_relations(link_model, user, recipe_ids):
+    """Добавляет рецепты в избранное или корзину `user` одной пачкой.
+
+    Возвращает множества добавленных рецептов и рецептов, которые уже
+    были связаны с пользователем; несуществующие id не попадают ни в
+    одно из них. Связи вставляются одним `INSERT ... ON CONFLICT DO
+    NOTHING RETURNING`, как в `create_relation`, поэтому добавленными
+    считаются ровно возвращённые строки. Пакетная вставка не
+    отправляет сигналов, и счётчик увеличивается одним `UPDATE` только
+    у этих рецептов.
+    """
+    using = router.db_for_write(link_model)
+    connection = connections[using]
+    if not connection.features.can_return_columns_from_insert:
+        return _add_recipe_relations_one_by_one(link_model, user, recipe_ids)
+
+    with transaction.atomic(using=using):
+        found = set(
+            Recipe.objects.using(using)
+            .filter(pk__in=recipe_ids)
+            .values_list("pk", flat=True)
+        )
+        if not found:
+            return set(), set()
+
+        rows = _insert_relations(
+            link_model,
+            [link_model(user=user, recipe_id=pk) for pk in found],
+            connection,
+            link_model._meta.get_field("recipe"),
+        )
+        created = {recipe_id for (recipe_id,) in rows}
+        if created:
+            change_counters(Recipe, created, recipe_counter(link_model), 1)
+    return created, found - created
+
+
+def remove_recipe_relations(link_model, user, recipe_ids):
+    """Убирает рецепты из избранного или корзины `user` одной пачкой.
+
+    Возвращает множество id, связи с которыми были удалены. Строки
+    удаляются одним `DELETE ... RETURNING`, как в `delete_relation`,
+    без загрузки объектов и сигналов; счётчик уменьшается одним
+    `UPDATE` только у возвращённых рецептов.
+    """
+    using = router.db_for_write(link_model)
+    connection = connections[using]
+    if not connection.features.can_return_columns_from_insert:
+        return {
+            pk
+            for pk in recipe_ids
+            if delete_relation(link_model, user, pk) is not None
+        }
+    if not recipe_ids:
+        return set()
+
+    opts = link_model._meta
+    quote = connection.ops.quote_name
+    recipe_column = quote(opts.get_field("recipe").column)
+    sql = (
+        f"DELETE FROM {quote(opts.db_table)} "
+        f"WHERE {quote(opts.get_field('user').column)} = %s "
+        f"AND {recipe_column} IN ({', '.join(['%s'] * len(recipe_ids))}) "
+        f"RETURNING {recipe_column}"
+    )
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (user.pk, *recipe_ids))
+            removed = {recipe_id for (recipe_id,) in cursor.fetchall()}
+        if removed:
+            change_counters(Recipe, removed, recipe_counter(link_model), -1)
+    return removed
+
+
+def _add_recipe_relations_one_by_one(link_model, user, recipe_ids):
+    """Запасной путь для БД без `RETURNING`: связи по одной с сигналами."""
+    found = set(
+        Recipe.objects.filter(pk__in=recipe_ids).values_list("pk", flat=True)
+    )
+    created = set()
+    for pk in found:
+        try:
+            if create_relation(link_model, user, pk) is not None:
+                created.add(pk)
+        except IntegrityError:
+            # Рецепт удалили после проверки.
+            continue
+    return created, found - created
+
+
+def _insert_relations(link_model, instances, connection, returning):
+    """Вставляет связи `INSERT ... ON CONFLICT DO NOTHING RETURNING`.
+
+    Возвращает строки со столбцом поля `returning` только для
+    вставленных связей, существующие пропускаются.
+    """
+    opts = link_model._meta
+    fields = [
+        field for field in opts.local_concrete_fields if field != opts.pk
+    ]
+    quote = connection.ops.quote_name
+    row = f"({', '.join(['%s'] * len(fields))})"
+    sql = (
+        f"INSERT INTO {quote(opts.db_table)} "
+        f"({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES {', '.join([row] * len(instances))} "
+        f"ON CONFLICT DO NOTHING RETURNING {quote(returning.column)}"
+    )
+    params = [
+        field.get_db_prep_save(field.pre_save(instance, True), connection)
+        for instance in instances
+        for field in fields
     ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def shopping_list_ingredients(user):
+    """Суммирует ингредиенты из корзины, читая строки курсором БД."""
     Ingredient = apps.get_model("recipes", "Ingredient")
-    ingredients = (
+    return (
         Ingredient.objects.filter(recipe__recipe__in_carts__user=user)
         .values("name", measurement=F("measurement_unit"))
         .annotate(amount=Sum("recipe__amount"))
+        .order_by("name")
+        .iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+    )
+
+
+def create_shoping_list(user, file_format="txt"):
+    """Возвращает итератор по частям списка покупок в формате `file_format`.
+
+    Текстовые форматы формируются построчно по мере чтения из БД.
+    PDF рисуется в фоне, см. `start_shopping_list_pdf`.
+    """
+    return SHOPPING_LIST_WRITERS[file_format](
+        user, shopping_list_ingredients(user)
+    )
+
+
+def iterate_async(iterator, batch_size=ASYNC_STREAM_BATCH_SIZE):
+    """Превращает синхронный итератор ответа в асинхронный.
+
+    Под ASGI Django собирает синхронный `StreamingHttpResponse` в
+    список целиком. Здесь части берутся пачками по `batch_size` через
+    `sync_to_async` в потоке запроса, поэтому курсор БД читается тем
+    же потоком, что его открыл, а цикл событий не блокируется. Пачка
+    склеивается в одну часть, чтобы не отправлять каждую строку
+    отдельным сообщением ASGI.
+    """
+    next_batch = sync_to_async(lambda: list(islice(iterator, batch_size)))
+
+    async def chunks():
+        while batch := await next_batch():
+            yield batch[0][:0].join(batch)
+
+    return chunks()
+
+
+def _shopping_list_header(user):
+    return (
+        f"Список покупок для: {user.first_name}",
+        dt.now().strftime(DATE_TIME_FORMAT),
     )
-    ingredient_list = (
-        f"""{ingredient["name"]}:
-            {ingredient["amount"]}
-            {ingredient["measurement"]}"""
-        for ingredient in ingredients
+
+
+def _write_txt(user, ingredients):
+    yield "\n".join(_shopping_list_header(user)) + "\n\n"
+    for ingredient in ingredients:
+        yield (
+            f"{ingredient['name']}: "
+            f"{ingredient['amount']} {ingredient['measurement']}\n"
+        )
+    yield "\nПосчитано в Foodgram\n"
+
+
+class _Echo:
+    """Буфер для `csv.writer`, возвращающий строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def _write_csv(user, ingredients):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(("name", "amount", "measurement_unit"))
+    for ingredient in ingredients:
+        yield writer.writerow(
+            (
+                ingredient["name"],
+                ingredient["amount"],
+                ingredient["measurement"],
+            )
+        )
+
+
+def _write_json(user, ingredients):
+    yield '{"user": %s, "ingredients": [' % json.dumps(user.username)
+    separator = ""
+    for ingredient in ingredients:
+        yield separator + json.dumps(
+            {
+                "name": ingredient["name"],
+                "amount": ingredient["amount"],
+                "measurement_unit": ingredient["measurement"],
+            },
+            ensure_ascii=False,
+        )
+        separator = ", "
+    yield "]}"
+
+
+def start_shopping_list_pdf(user):
+    """Ставит PDF со списком покупок `user` в фоновый пул.
+
+    Возвращает id задания, состояние которого отдаёт
+    `shopping_list_pdf_job`. Файлы прошлых заданий пользователя
+    удаляются.
+    """
+    job_id = uuid4().hex
+    directory = f"{SHOPPING_LISTS_DIR}/{user.pk}"
+    if default_storage.exists(directory):
+        for name in default_storage.listdir(directory)[1]:
+            default_storage.delete(f"{directory}/{name}")
+
+    cache.set(
+        _pdf_job_key(user.pk, job_id),
+        {"status": JobStatus.PENDING.value},
+        SHOPPING_LIST_PDF_TTL,
     )
-    shopping_list.extend(ingredient_list)
-    shopping_list.append("\nПосчитано в Foodgram")
-    return "\n".join(shopping_list)
+    image_executor.submit(_run_pdf_job, user, job_id)
+    return job_id
+
+
+def shopping_list_pdf_job(user, job_id):
+    """Возвращает состояние задания или `None`, если его нет."""
+    return cache.get(_pdf_job_key(user.pk, job_id))
+
+
+def read_shopping_list_pdf(name):
+    """Возвращает итератор по частям готового PDF или `None`."""
+    if not default_storage.exists(name):
+        return None
+    return _read_file(name)
+
+
+def render_shopping_list_pdf(user, name):
+    """Рисует PDF и сохраняет его в хранилище под именем `name`.
+
+    Документ пишется во временный файл, который до `PDF_SPOOL_SIZE`
+    байт держится в памяти, а дальше уходит на диск.
+    """
+    if PDF_FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, PDF_FONT_PATH))
+
+    with SpooledTemporaryFile(max_size=PDF_SPOOL_SIZE) as file:
+        pdf = canvas.Canvas(file, pagesize=A4)
+        width, height = A4
+        margin, line_height = 50, 18
+        y = height - margin
+
+        lines = (
+            *_shopping_list_header(user),
+            "",
+            *(
+                f"{ingredient['name']}: "
+                f"{ingredient['amount']} {ingredient['measurement']}"
+                for ingredient in shopping_list_ingredients(user)
+            ),
+            "",
+            "Посчитано в Foodgram",
+        )
+        for line in lines:
+            if y < margin:
+                pdf.showPage()
+                y = height - margin
+            pdf.setFont(PDF_FONT_NAME, 12)
+            pdf.drawString(margin, y, line)
+            y -= line_height
+
+        pdf.save()
+        file.seek(0)
+        return default_storage.save(name, File(file))
+
+
+def _run_pdf_job(user, job_id):
+    """Выполняет задание в потоке пула и закрывает его соединения с БД."""
+    key = _pdf_job_key(user.pk, job_id)
+    try:
+        name = render_shopping_list_pdf(
+            user, f"{SHOPPING_LISTS_DIR}/{user.pk}/{job_id}.pdf"
+        )
+    except Exception:
+        logger.exception("Не удалось нарисовать PDF задания %s", job_id)
+        job = {"status": JobStatus.FAILED.value}
+    else:
+        job = {"status": JobStatus.READY.value, "file": name}
+    finally:
+        connections.close_all()
+    cache.set(key, job, SHOPPING_LIST_PDF_TTL)
+
+
+def _read_file(name):
+    with default_storage.open(name) as file:
+        yield from file.chunks(SHOPPING_LIST_CHUNK_SIZE)
+
+
+def _pdf_job_key(user_id, job_id):
+    return f"shopping_list_pdf:{user_id}:{job_id}"
+
+
+SHOPPING_LIST_WRITERS = {
+    "txt": _write_txt,
+    "csv": _write_csv,
+    "json": _write_json,
+}
+
+SHOPPING_LIST_CONTENT_TYPES = {
+    "txt": "text/plain; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+}
+if canvas is not None:
+    SHOPPING_LIST_CONTENT_TYPES["pdf"] = "application/pdf"
 
 
 def maybe_wrong_layout(url_string):
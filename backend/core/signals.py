@@ -1,13 +1,174 @@
+from functools import partial
 from pathlib import Path
 
-from django.db.models.signals import post_delete
+from rest_framework.authtoken.models import Token
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
 from django.dispatch import receiver
 
-from recipes.models import Recipe
+from core import feed
+from core.cache import (
+    bump_author,
+    bump_recipe,
+    changed_recipe_generations,
+    recipes_cache,
+    reference_cache,
+    token_cache,
+)
+from core.counters import change_counter
+from core.images import delete_renditions
+from recipes.models import (
+    Carts,
+    Favorite,
+    FeedEntry,
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from users.models import Subscription
+
+User = get_user_model()
+
+COUNTED_RELATIONS = {
+    Favorite: (Recipe, "favorites_count", "recipe_id"),
+    Carts: (Recipe, "carts_count", "recipe_id"),
+    Subscription: (User, "subscribers_count", "author_id"),
+    Recipe: (User, "recipes_count", "author_id"),
+}
 
 
 @receiver(post_delete, sender=Recipe)
 def delete_image(sender, instance, *args, **kwargs):
+    delete_renditions(instance.image_renditions)
+    if not instance.image:
+        return
+
     image = Path(instance.image.path)
     if image.exists():
         image.unlink()
+
+
+@receiver(post_save, sender=Recipe)
+def reset_recipe_cache(sender, instance, *args, **kwargs):
+    transaction.on_commit(
+        partial(
+            bump_recipe,
+            instance.pk,
+            {instance.author_id, instance._saved_author_id},
+        )
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def reset_deleted_recipe_cache(sender, instance, *args, **kwargs):
+    tags = list(instance.tags.values_list("slug", flat=True))
+    generations = changed_recipe_generations(
+        instance.pk, (instance.author_id,), tags
+    )
+    transaction.on_commit(partial(recipes_cache.bump, *generations))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def reset_recipe_tags_cache(
+    sender, instance, action, reverse, pk_set, *args, **kwargs
+):
+    if reverse:
+        if action in ("post_add", "post_remove", "pre_clear"):
+            transaction.on_commit(partial(recipes_cache.bump, "epoch"))
+        return
+
+    if action == "pre_clear":
+        tags = instance.tags.all()
+    elif action in ("post_add", "post_remove"):
+        tags = Tag.objects.filter(pk__in=pk_set)
+    else:
+        return
+
+    generations = changed_recipe_generations(
+        instance.pk, tags=list(tags.values_list("slug", flat=True))
+    )
+    transaction.on_commit(partial(recipes_cache.bump, *generations))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def reset_reference_cache(sender, *args, **kwargs):
+    transaction.on_commit(partial(recipes_cache.bump, "epoch"))
+    transaction.on_commit(
+        partial(reference_cache.bump, sender._meta.model_name)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def reset_token_cache(sender, instance, *args, **kwargs):
+    transaction.on_commit(partial(token_cache.invalidate, instance.key))
+
+
+@receiver(post_save, sender=User)
+def reset_user_tokens(sender, instance, *args, **kwargs):
+    transaction.on_commit(partial(token_cache.invalidate_user, instance.pk))
+
+
+@receiver(post_save, sender=User)
+def reset_author_cache(sender, instance, created, update_fields, **kwargs):
+    if created or update_fields == frozenset(("last_login",)):
+        return
+
+    transaction.on_commit(partial(bump_author, instance.pk))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Carts)
+@receiver(post_save, sender=Subscription)
+@receiver(post_save, sender=Recipe)
+def count_created(sender, instance, created, *args, **kwargs):
+    model, field, pk_field = COUNTED_RELATIONS[sender]
+    if created:
+        change_counter(model, getattr(instance, pk_field), field, 1)
+    elif sender is Recipe and instance.author_id != instance._saved_author_id:
+        change_counter(model, instance._saved_author_id, field, -1)
+        change_counter(model, instance.author_id, field, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Carts)
+@receiver(post_delete, sender=Subscription)
+@receiver(post_delete, sender=Recipe)
+def count_deleted(sender, instance, *args, **kwargs):
+    model, field, pk_field = COUNTED_RELATIONS[sender]
+    change_counter(model, getattr(instance, pk_field), field, -1)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, *args, **kwargs):
+    if created:
+        transaction.on_commit(
+            partial(feed.schedule, feed.fan_out_recipe, instance.pk)
+        )
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_feed(sender, instance, created, *args, **kwargs):
+    if created:
+        transaction.on_commit(
+            partial(
+                feed.schedule,
+                feed.backfill_feed,
+                instance.user_id,
+                instance.author_id,
+            )
+        )
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed(sender, instance, *args, **kwargs):
+    FeedEntry.objects.filter(
+        user_id=instance.user_id, recipe__author_id=instance.author_id
+    ).delete()
@@ -0,0 +1,76 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.cache import recipes_cache
+from recipes.models import Recipe, Tag
+
+User = get_user_model()
+
+
+class AuthorCacheTest(TestCase):
+    """Изменение автора сбрасывает кеш только его рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.other = (
+            User.objects.create_user(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password="Password-12345",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for index in range(2)
+        )
+        cls.tag, cls.other_tag = Tag.objects.bulk_create(
+            Tag(name=f"тег{index}", color="#FFFFFF", slug=f"tag{index}")
+            for index in range(2)
+        )
+        cls.recipe, cls.other_recipe = (
+            Recipe.objects.create(
+                author=author, name="Рецепт", text="Описание", cooking_time=10
+            )
+            for author in (cls.author, cls.other)
+        )
+        cls.recipe.tags.set((cls.tag,))
+        cls.other_recipe.tags.set((cls.other_tag,))
+
+    def setUp(self):
+        cache.clear()
+
+    def changed(self, *generations):
+        """Возвращает те из `generations`, что сменились при сохранении."""
+        before = recipes_cache.generations(*generations)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = "Другое"
+            self.author.save()
+        after = recipes_cache.generations(*generations)
+        return {
+            generation
+            for generation, old, new in zip(generations, before, after)
+            if old != new
+        }
+
+    def test_author_save(self):
+        own = {
+            f"recipe:{self.recipe.pk}",
+            f"author:{self.author.pk}",
+            f"tag:{self.tag.slug}",
+            "list",
+        }
+        others = {
+            "epoch",
+            f"recipe:{self.other_recipe.pk}",
+            f"author:{self.other.pk}",
+            f"tag:{self.other_tag.slug}",
+        }
+        self.assertEqual(self.changed(*own, *others), own)
+
+    def test_last_login(self):
+        before = recipes_cache.generations(f"author:{self.author.pk}")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.save(update_fields=("last_login",))
+        self.assertEqual(
+            recipes_cache.generations(f"author:{self.author.pk}"), before
+        )
@@ -0,0 +1,51 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core.middleware import _instrument_connection
+from recipes.models import Recipe
+
+SQL_INSTRUMENTATION = "core.middleware.SQLInstrumentationMiddleware"
+
+
+@override_settings(
+    MIDDLEWARE=[
+        SQL_INSTRUMENTATION,
+        *(name for name in settings.MIDDLEWARE if name != SQL_INSTRUMENTATION),
+    ]
+)
+class SQLInstrumentationTest(TestCase):
+    """Запросы к БД учитываются и в синхронном, и в асинхронном режиме.
+
+    В асинхронном режиме представление выполняется в потоке
+    `sync_to_async`, а middleware - в цикле событий.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Recipe.objects.create(name="Рецепт", text="Описание", cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+        # Подключение к тестовой БД открыто раньше, чем создан middleware,
+        # а асинхронный тестовый клиент шлёт `request_started` из другого
+        # потока.
+        _instrument_connection(connection=connection)
+
+    def assert_counted(self, output):
+        (line,) = output
+        self.assertRegex(line, r"GET /api/recipes/ 200 queries=\d+ ")
+        self.assertNotEqual(re.search(r"queries=(\d+)", line)[1], "0")
+
+    def test_sync_request(self):
+        with self.assertLogs("core.middleware", "INFO") as logs:
+            self.client.get("/api/recipes/")
+        self.assert_counted(logs.output)
+
+    async def test_async_request(self):
+        with self.assertLogs("core.middleware", "INFO") as logs:
+            await self.async_client.get("/api/recipes/")
+        self.assert_counted(logs.output)
@@ -0,0 +1,145 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.pooled_postgresql import base
+from core.pooled_postgresql.base import IDLE, ConnectionPool, DatabaseWrapper
+
+IN_TRANSACTION = 2
+INVALID = 4
+
+
+class FakeConnection:
+    """Соединение psycopg с тем минимумом, который нужен пулу."""
+
+    def __init__(self, status=IDLE, broken=False):
+        self.closed = False
+        self.broken = broken
+        self.info = SimpleNamespace(transaction_status=status)
+
+    def rollback(self):
+        self.info.transaction_status = IDLE
+
+    def close(self):
+        self.closed = True
+
+    def cursor(self):
+        if self.broken:
+            raise DatabaseWrapper.Database.OperationalError("server closed")
+        return mock.MagicMock()
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def test_keeps_at_most_size_connections(self):
+        pool = ConnectionPool(1)
+        first, second = FakeConnection(), FakeConnection()
+        self.assertTrue(pool.put(first))
+        self.assertFalse(pool.put(second))
+        self.assertIs(pool.take()[0], first)
+        self.assertEqual(pool.take(), (None, None))
+
+    def test_clear_closes_idle_connections(self):
+        pool = ConnectionPool(2)
+        connection = FakeConnection()
+        pool.put(connection)
+        pool.clear()
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.take(), (None, None))
+
+    def test_pool_per_alias(self):
+        self.assertIs(base.get_pool("pool_a", 1), base.get_pool("pool_a", 1))
+        self.assertIsNot(
+            base.get_pool("pool_a", 1), base.get_pool("pool_b", 1)
+        )
+
+
+class PooledDatabaseWrapperTest(SimpleTestCase):
+    """Выдача соединений из пула и возврат в него без настоящей БД."""
+
+    def setUp(self):
+        self.alias = f"pool_{self._testMethodName}"
+        self.settings_dict = {
+            "NAME": "postgres",
+            "USER": "",
+            "PASSWORD": "",
+            "HOST": "",
+            "PORT": "",
+            "OPTIONS": {},
+            "TIME_ZONE": None,
+            "AUTOCOMMIT": True,
+            "ATOMIC_REQUESTS": False,
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": True,
+            "POOL_SIZE": 2,
+            "POOL_CHECK_AFTER": 30,
+        }
+        patcher = mock.patch.object(
+            base.base.DatabaseWrapper, "get_new_connection"
+        )
+        self.connect = patcher.start()
+        self.connect.side_effect = lambda params: FakeConnection()
+        self.addCleanup(patcher.stop)
+
+    def wrapper(self):
+        return DatabaseWrapper(self.settings_dict, self.alias)
+
+    def release(self, connection, **state):
+        wrapper = self.wrapper()
+        wrapper.connection = connection
+        for name, value in state.items():
+            setattr(wrapper, name, value)
+        wrapper._close()
+        return wrapper
+
+    def test_returned_connection_is_reused(self):
+        connection = FakeConnection()
+        self.release(connection)
+        self.assertFalse(connection.closed)
+        self.assertIs(self.wrapper().get_new_connection({}), connection)
+        self.connect.assert_not_called()
+
+    def test_empty_pool_opens_connection(self):
+        connection = self.wrapper().get_new_connection({})
+        self.assertIsInstance(connection, FakeConnection)
+        self.connect.assert_called_once()
+
+    def test_open_transaction_is_rolled_back(self):
+        connection = FakeConnection(status=IN_TRANSACTION)
+        self.release(connection)
+        self.assertEqual(connection.info.transaction_status, IDLE)
+        self.assertIs(self.wrapper().get_new_connection({}), connection)
+
+    def test_connection_with_errors_is_closed(self):
+        connection = FakeConnection()
+        self.release(connection, errors_occurred=True)
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.wrapper().pool.take(), (None, None))
+
+    def test_connection_in_atomic_block_is_closed(self):
+        connection = FakeConnection()
+        self.release(connection, in_atomic_block=True)
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.wrapper().pool.take(), (None, None))
+
+    def test_broken_transaction_is_discarded(self):
+        connection = FakeConnection(status=INVALID)
+        self.wrapper().pool.put(connection)
+        new_connection = self.wrapper().get_new_connection({})
+        self.assertTrue(connection.closed)
+        self.assertIsNot(new_connection, connection)
+        self.connect.assert_called_once()
+
+    def test_idle_connection_is_checked(self):
+        connection = FakeConnection(broken=True)
+        with mock.patch.object(base, "monotonic", return_value=0):
+            self.wrapper().pool.put(connection)
+        with mock.patch.object(base, "monotonic", return_value=60):
+            new_connection = self.wrapper().get_new_connection({})
+        self.assertTrue(connection.closed)
+        self.assertIsNot(new_connection, connection)
+
+    def test_recent_connection_is_not_checked(self):
+        connection = FakeConnection(broken=True)
+        self.wrapper().pool.put(connection)
+        self.assertIs(self.wrapper().get_new_connection({}), connection)
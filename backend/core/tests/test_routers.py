@@ -0,0 +1,156 @@
+from random import choice
+from unittest import mock
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+REPLICA = "replica"
+
+
+@override_settings(
+    DATABASE_ROUTERS=["core.routers.PrimaryReplicaRouter"],
+    MIDDLEWARE=[
+        "core.middleware.ReplicaRoutingMiddleware",
+        *settings.MIDDLEWARE,
+    ],
+)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Чтение в запросах идёт на реплику, запись - на основную БД.
+
+    Реплика - второе подключение к той же тестовой БД, поэтому она
+    видит все данные сразу, без задержки.
+    """
+
+    # Реплика появляется в `setUpClass`, после того как тестовые БД уже
+    # созданы, поэтому её нельзя перечислить здесь явно.
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        connections.settings[REPLICA] = {
+            **connections[DEFAULT_DB_ALIAS].settings_dict
+        }
+        cls.addClassCleanup(cls._remove_replica)
+        replicas = mock.patch("core.routers.DATABASE_REPLICAS", (REPLICA,))
+        replicas.start()
+        cls.addClassCleanup(replicas.stop)
+        super().setUpClass()
+
+    @classmethod
+    def _remove_replica(cls):
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        cache.clear()
+        self.user, author = (
+            User.objects.create_user(
+                username=f"user{index}",
+                email=f"user{index}@example.com",
+                password="Password-12345",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for index in range(2)
+        )
+        self.recipe = Recipe.objects.create(
+            author=author, name="Рецепт", text="Описание", cooking_time=10
+        )
+        self.client = self.client_for(self.user)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=user)}"
+        )
+        return client
+
+    def request(self, method, path, client=None):
+        """Выполняет запрос и возвращает SQL, ушедший в каждую БД."""
+        with CaptureQueriesContext(
+            connections[DEFAULT_DB_ALIAS]
+        ) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+            response = getattr(client or self.client, method)(path)
+        return (
+            response,
+            [query["sql"] for query in primary],
+            [query["sql"] for query in replica],
+        )
+
+    def assert_reads_recipes(self, queries):
+        self.assertTrue(
+            any("recipes_recipe" in sql for sql in queries), queries
+        )
+
+    def test_safe_request_reads_replica(self):
+        response, primary, replica = self.request(
+            "get", f"/api/recipes/{self.recipe.pk}/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assert_reads_recipes(replica)
+        self.assertFalse(
+            any("recipes_recipe" in sql for sql in primary), primary
+        )
+
+    def test_write_goes_to_primary(self):
+        response, primary, replica = self.request(
+            "post", f"/api/recipes/{self.recipe.pk}/favorite/"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(
+            any(sql.startswith("INSERT") for sql in primary), primary
+        )
+        self.assertEqual(replica, [])
+
+    def test_read_after_write_sticks_to_primary(self):
+        self.request("post", f"/api/recipes/{self.recipe.pk}/favorite/")
+
+        response, primary, replica = self.request(
+            "get", f"/api/recipes/{self.recipe.pk}/"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["is_favorited"])
+        self.assert_reads_recipes(primary)
+        self.assertEqual(replica, [])
+
+        other = self.client_for(User.objects.exclude(pk=self.user.pk).get())
+        _, _, replica = self.request(
+            "get", f"/api/recipes/{self.recipe.pk}/", other
+        )
+        self.assert_reads_recipes(replica)
+
+    async def test_async_read_after_write_sticks_to_primary(self):
+        """То же в режиме ASGI: middleware работает без перехода в sync.
+
+        Запросы к БД здесь идут из другого потока, поэтому выбор реплики
+        отслеживается по вызовам `choice` в маршрутизаторе.
+        """
+        token = await Token.objects.aget(user=self.user)
+        authorization = {"headers": {"Authorization": f"Token {token}"}}
+        path = f"/api/recipes/{self.recipe.pk}/"
+        with mock.patch("core.routers.choice", side_effect=choice) as spy:
+            response = await self.async_client.get(path, **authorization)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(spy.called)
+
+            response = await self.async_client.post(
+                f"{path}favorite/", **authorization
+            )
+            self.assertEqual(response.status_code, 201)
+
+            spy.reset_mock()
+            response = await self.async_client.get(path, **authorization)
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(spy.called)
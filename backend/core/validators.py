@@ -4,6 +4,8 @@ from string import hexdigits
 from django.core.exceptions import ValidationError
 from django.utils.deconstruct import deconstructible
 
+from core.registry import get_registry
+
 
 @deconstructible
 class OneOfTwoValidator:
@@ -77,12 +79,17 @@ def tags_exist_validator(tags_ids, Tag):
     if not tags_ids:
         raise ValidationError("Не указаны тэги")
 
-    tags = Tag.objects.filter(id__in=tags_ids)
+    try:
+        tags_ids = {int(tag_id) for tag_id in tags_ids}
+    except (TypeError, ValueError):
+        raise ValidationError("Указан несуществующий тэг")
+
+    tags = get_registry(Tag).instances(tags_ids)
 
     if len(tags) != len(tags_ids):
         raise ValidationError("Указан несуществующий тэг")
 
-    return tags
+    return list(tags.values())
 
 
 def ingredients_validator(ingredients, Ingredient):
@@ -98,21 +105,23 @@ def ingredients_validator(ingredients, Ingredient):
         ):
             raise ValidationError("Неправильное количество ингидиента")
 
-        valid_ingredients[ingredient["id"]] = int(ingredient["amount"])
-        if valid_ingredients[ingredient["id"]] <= 0:
+        try:
+            ingredient_id = int(ingredient["id"])
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError("Неправильные ингидиенты")
+
+        valid_ingredients[ingredient_id] = int(ingredient["amount"])
+        if valid_ingredients[ingredient_id] <= 0:
             raise ValidationError("Неправильное количество ингридиента")
 
     if not valid_ingredients:
         raise ValidationError("Неправильные ингидиенты")
 
-    db_ingredients = Ingredient.objects.filter(pk__in=valid_ingredients.keys())
-    if not db_ingredients:
+    db_ingredients = get_registry(Ingredient).instances(valid_ingredients)
+    if len(db_ingredients) != len(valid_ingredients):
         raise ValidationError("Неправильные ингидиенты")
 
-    for ingredient in db_ingredients:
-        valid_ingredients[ingredient.pk] = (
-            ingredient,
-            valid_ingredients[ingredient.pk],
-        )
+    for pk, ingredient in db_ingredients.items():
+        valid_ingredients[pk] = (ingredient, valid_ingredients[pk])
 
     return valid_ingredients
@@ -6,6 +6,11 @@ while ! nc -z db 5432;
 done;
     echo "connected to the db";
 
+python manage.py check --deploy --fail-level ERROR || exit 1;
 python manage.py migrate;
 python manage.py collectstatic --noinput;
-gunicorn -w 2 -b 0:8000 foodgram.wsgi;
\ No newline at end of file
+if [ "$SERVER_MODE" = "asgi" ]; then
+    gunicorn -w ${WEB_WORKERS:-2} -k uvicorn.workers.UvicornWorker -b 0:8000 foodgram.asgi:application;
+else
+    gunicorn -w ${WEB_WORKERS:-2} -b 0:8000 foodgram.wsgi;
+fi
\ No newline at end of file
@@ -4,6 +4,29 @@ from decouple import Csv, config
 
 DATE_TIME_FORMAT = "%d/%m/%Y %H:%M"
 
+PDF_FONT_PATH = config(
+    "PDF_FONT_PATH",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+# Сколько секунд хранится готовый PDF со списком покупок.
+SHOPPING_LIST_PDF_TTL = config(
+    "SHOPPING_LIST_PDF_TTL", default=3600, cast=int
+)
+
+# Потоки фонового пула картинок рецептов, в нём же рисуются PDF.
+IMAGE_WORKERS = config("IMAGE_WORKERS", default=2, cast=int)
+
+FEED_WORKERS = config("FEED_WORKERS", default=2, cast=int)
+
+# Авторам с большим числом подписчиков лента собирается при чтении.
+FEED_FANOUT_LIMIT = config("FEED_FANOUT_LIMIT", default=10000, cast=int)
+
+FEED_MAX_ENTRIES = config("FEED_MAX_ENTRIES", default=500, cast=int)
+
+# "asgi" - воркеры uvicorn (см. entrypoint.sh) и асинхронные
+# обработчики горячих GET-запросов в api/async_views.py.
+SERVER_MODE = config("SERVER_MODE", default="wsgi")
+
 DEBUG = config("DEBUG", default=False, cast=bool)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,6 +52,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "rest_framework.authtoken",
     "djoser",
@@ -72,11 +96,92 @@ DATABASES = {
         "PASSWORD": config("POSTGRES_PASSWORD", default="postgres"),
         "HOST": config("DB_HOST", default="127.0.0.1"),
         "PORT": config("DB_PORT", default=5432, cast=int),
+        "CONN_MAX_AGE": config("DB_CONN_MAX_AGE", default=60, cast=int),
+        "CONN_HEALTH_CHECKS": config(
+            "DB_CONN_HEALTH_CHECKS", default=True, cast=bool
+        ),
     }
 }
 
+# Пул соединений для потоковых и ASGI-воркеров, где соединение живёт
+# в потоке одного запроса. В режиме ASGI пул включён по умолчанию, а
+# постоянные соединения выключены: потоки sync_to_async копили бы их
+# до исчерпания лимита соединений Postgres.
+DB_POOL = config("DB_POOL", default=SERVER_MODE == "asgi", cast=bool)
+if SERVER_MODE == "asgi":
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+if DB_POOL and DATABASES["default"]["ENGINE"].endswith("postgresql"):
+    DATABASES["default"].update(
+        ENGINE="core.pooled_postgresql",
+        POOL_SIZE=config("DB_POOL_SIZE", default=10, cast=int),
+        POOL_CHECK_AFTER=config("DB_POOL_CHECK_AFTER", default=30, cast=int),
+    )
+
+# Реплики для чтения: DB_REPLICAS=host[:port][/name],... - всё, что
+# не указано, берётся из основной БД; значение, начинающееся с "/",
+# целиком считается именем БД (путь к файлу SQLite). После записи
+# клиент читает основную БД DB_REPLICA_STICKY_SECONDS секунд.
+DATABASE_REPLICAS = ()
+for index, replica in enumerate(config("DB_REPLICAS", default="", cast=Csv())):
+    address, _, name = ("", "", replica) if replica.startswith("/") else (
+        replica.partition("/")
+    )
+    host, _, port = address.partition(":")
+    alias = f"replica_{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST": host or DATABASES["default"]["HOST"],
+        "PORT": int(port) if port else DATABASES["default"]["PORT"],
+        "NAME": name or DATABASES["default"]["NAME"],
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS += (alias,)
+
+DB_REPLICA_STICKY_SECONDS = config(
+    "DB_REPLICA_STICKY_SECONDS", default=5, cast=int
+)
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+
+# Поколения кешей, версии справочников и отметки "читать основную БД"
+# хранятся в CACHE_BACKEND и должны быть общими для всех воркеров.
+# LocMemCache годится только для одного процесса: при WEB_WORKERS > 1
+# `manage.py check --deploy` требует Redis или Memcached.
+WEB_WORKERS = config("WEB_WORKERS", default=2, cast=int)
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="foodgram"),
+    }
+}
+
+RECIPES_CACHE_TIMEOUT = config("RECIPES_CACHE_TIMEOUT", default=300, cast=int)
+
+REFERENCE_CACHE_MAX_AGE = config(
+    "REFERENCE_CACHE_MAX_AGE", default=3600, cast=int
+)
+
+# Снимки токенов в памяти воркера живут TOKEN_CACHE_TTL секунд: это
+# наибольшая задержка, с которой бан или выход из системы доходят до
+# других воркеров. TOKEN_CACHE_SHARED_TIMEOUT > 0 включает второй
+# уровень в CACHE_BACKEND.
+TOKEN_CACHE_SIZE = config("TOKEN_CACHE_SIZE", default=10000, cast=int)
+TOKEN_CACHE_TTL = config("TOKEN_CACHE_TTL", default=30, cast=int)
+TOKEN_CACHE_SHARED_TIMEOUT = config(
+    "TOKEN_CACHE_SHARED_TIMEOUT", default=0, cast=int
+)
+
 AUTH_USER_MODEL = "users.MyUser"
 
+# memory - индекс в памяти процесса, trigram - pg_trgm в Postgres.
+INGREDIENTS_SEARCH_MODE = config("INGREDIENTS_SEARCH_MODE", default="memory")
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -94,7 +199,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -131,8 +236,34 @@ MEDIA_ROOT = BASE_DIR / MEDIA_URL
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Индекс recipes_amount_ingredient покрывает `amount` через INCLUDE. Это
+# есть только в Postgres, в SQLite индекс создаётся без INCLUDE и всё
+# равно служит поиску по ключевым столбцам.
+SILENCED_SYSTEM_CHECKS = ["models.W040"]
+
 PASSWORD_RESET_TIMEOUT = 60 * 60
 
+# Одна строка лога на запрос: число запросов к БД, время в БД и самые
+# долгие запросы. SQL_DEBUG_LOG включает вывод каждого запроса в
+# консоль (Django пишет его только при DEBUG=True).
+SQL_INSTRUMENTATION = config("SQL_INSTRUMENTATION", default=True, cast=bool)
+SQL_INSTRUMENTATION_SLOWEST = config(
+    "SQL_INSTRUMENTATION_SLOWEST", default=3, cast=int
+)
+SQL_INSTRUMENTATION_SQL_LENGTH = config(
+    "SQL_INSTRUMENTATION_SQL_LENGTH", default=120, cast=int
+)
+SQL_INSTRUMENTATION_SAMPLE_RATE = config(
+    "SQL_INSTRUMENTATION_SAMPLE_RATE", default=0.0, cast=float
+)
+SQL_DEBUG_LOG = config("SQL_DEBUG_LOG", default=False, cast=bool)
+
+if DATABASE_REPLICAS:
+    MIDDLEWARE.insert(0, "core.middleware.ReplicaRoutingMiddleware")
+
+if SQL_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, "core.middleware.SQLInstrumentationMiddleware")
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -142,11 +273,20 @@ LOGGING = {
         },
     },
     "loggers": {
-        "django.db.backends": {
-            "level": "DEBUG",
+        "core.middleware": {
+            "level": "INFO",
             "handlers": [
                 "console",
             ],
+            "propagate": False,
         },
     },
 }
+
+if SQL_DEBUG_LOG:
+    LOGGING["loggers"]["django.db.backends"] = {
+        "level": "DEBUG",
+        "handlers": [
+            "console",
+        ],
+    }
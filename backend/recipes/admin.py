@@ -7,8 +7,13 @@ from django.contrib.admin import (
 )
 from django.core.handlers.wsgi import WSGIRequest
 from django.utils.html import format_html
-from django.utils.safestring import SafeString, mark_safe
+from django.utils.safestring import SafeString
 
+from core.admin_tools import (
+    AutocompleteFilter,
+    AutocompleteFilterMixin,
+    EstimatedCountPaginator,
+)
 from recipes.forms import TagForm
 from recipes.models import (
     AmountIngredient,
@@ -27,6 +32,7 @@ EMPTY_VALUE_DISPLAY = "Значение не указано"
 class IngredientInline(TabularInline):
     model = AmountIngredient
     extra = 2
+    autocomplete_fields = ("ingredients",)
 
 
 @register(AmountIngredient)
@@ -47,7 +53,7 @@ class IngredientAdmin(ModelAdmin):
 
 
 @register(Recipe)
-class RecipeAdmin(ModelAdmin):
+class RecipeAdmin(AutocompleteFilterMixin, ModelAdmin):
     list_display = (
         "name",
         "author",
@@ -75,26 +81,32 @@ class RecipeAdmin(ModelAdmin):
         "author__username",
         "tags__name",
     )
-    list_filter = ("name", "author__username", "tags__name")
+    list_filter = ("tags", ("author", AutocompleteFilter))
+    autocomplete_fields = ("author",)
 
     inlines = (IngredientInline,)
     save_on_top = True
     empty_value_display = EMPTY_VALUE_DISPLAY
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset.select_related("author").prefetch_related("tags")
-        return queryset
+        return super().get_queryset(request).select_related("author")
 
     def get_image(self, obj) -> SafeString:
-        return mark_safe(f'<img src={obj.image.url} width="80" hieght="30"')
+        if not obj.image:
+            return self.empty_value_display
+        return format_html(
+            '<img src="{}" width="80" height="30">', obj.image.url
+        )
 
     get_image.short_description = "Изображение"
 
     def count_favorites(self, obj):
-        return obj.in_favorites.count()
+        return obj.favorites_count
 
     count_favorites.short_description = "В избранном"
+    count_favorites.admin_order_field = "favorites_count"
 
 
 @register(Tag)
@@ -120,9 +132,16 @@ class TagAdmin(ModelAdmin):
 
 
 @register(Favorite)
-class FavoriteAdmin(ModelAdmin):
+class FavoriteAdmin(AutocompleteFilterMixin, ModelAdmin):
     list_display = ("user", "recipe", "date_added")
     search_fields = ("user__username", "recipe__name")
+    list_filter = (
+        ("user", AutocompleteFilter),
+        ("recipe", AutocompleteFilter),
+    )
+    autocomplete_fields = ("user", "recipe")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def has_change_permission(
         self, request: WSGIRequest, obj: Favorite | None = None
@@ -135,15 +154,24 @@ class FavoriteAdmin(ModelAdmin):
         return False
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset.select_related("user", "recipe")
-        return queryset
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("user", "recipe__author")
+        )
 
 
 @register(Carts)
-class CartAdmin(ModelAdmin):
+class CartAdmin(AutocompleteFilterMixin, ModelAdmin):
     list_display = ("user", "recipe", "date_added")
     search_fields = ("user__username", "recipe__name")
+    list_filter = (
+        ("user", AutocompleteFilter),
+        ("recipe", AutocompleteFilter),
+    )
+    autocomplete_fields = ("user", "recipe")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def has_change_permission(
         self, request: WSGIRequest, obj: Carts | None = None
@@ -156,6 +184,8 @@ class CartAdmin(ModelAdmin):
         return False
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset.select_related("user", "recipe")
-        return queryset
+        return (
+            super()
+            .get_queryset(request)
+            .select_related("user", "recipe__author")
+        )
@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from threading import Event, Thread
+from time import perf_counter
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+TIMEOUT = 30
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагружает запущенный сервер параллельными GET-запросами и "
+        "выводит число запросов в секунду и перцентили задержки. "
+        "Запустите один раз против WSGI, другой - против ASGI "
+        "(`SERVER_MODE=asgi`), чтобы сравнить режимы."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "url",
+            nargs="?",
+            default="http://localhost:8000/api/recipes/",
+            help="Адрес, который нагружается.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Сколько запросов выполняется одновременно.",
+        )
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=500,
+            help="Сколько запросов выполнить всего.",
+        )
+        parser.add_argument(
+            "--token", help="Токен для заголовка Authorization."
+        )
+        parser.add_argument(
+            "--background",
+            action="append",
+            default=[],
+            metavar="URL",
+            help=(
+                "Адрес медленного запроса, например скачивания списка "
+                "покупок, который повторяется в фоне всё время замера. "
+                "Можно указать несколько раз."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+        total = max(options["requests"], 1)
+
+        stop = Event()
+        background = [
+            Thread(target=_repeat, args=(url, headers, stop), daemon=True)
+            for url in options["background"]
+        ]
+        for thread in background:
+            thread.start()
+        try:
+            started = perf_counter()
+            with ThreadPoolExecutor(max(options["concurrency"], 1)) as pool:
+                results = list(
+                    pool.map(
+                        lambda _: _fetch(options["url"], headers),
+                        range(total),
+                    )
+                )
+            elapsed = perf_counter() - started
+        finally:
+            stop.set()
+
+        latencies = sorted(latency for _, latency in results)
+        errors = [status for status, _ in results if status != 200]
+        if len(errors) == total:
+            raise CommandError(f"Ни один запрос не выполнен: {errors[0]}")
+        if total > 1:
+            percentiles = quantiles(latencies, n=100)
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = latencies[0]
+
+        self.stdout.write(
+            f"{options['url']}: {total} запросов, "
+            f"{options['concurrency']} одновременно, "
+            f"фоновых {len(background)}\n"
+            f"{total / elapsed:.1f} запросов/с, "
+            f"задержка p50 {p50 * 1000:.0f} мс, "
+            f"p95 {p95 * 1000:.0f} мс, p99 {p99 * 1000:.0f} мс, "
+            f"макс. {latencies[-1] * 1000:.0f} мс, "
+            f"ошибок {len(errors)}"
+        )
+
+
+def _fetch(url, headers):
+    """Выполняет запрос и возвращает статус и время ответа в секундах."""
+    started = perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers), timeout=TIMEOUT) as answer:
+            answer.read()
+            status = answer.status
+    except HTTPError as error:
+        status = error.code
+    except (URLError, OSError) as error:
+        status = str(error)
+    return status, perf_counter() - started
+
+
+def _repeat(url, headers, stop):
+    while not stop.is_set():
+        _fetch(url, headers)
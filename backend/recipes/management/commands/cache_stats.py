@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.cache import recipes_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Выводит число попаданий и промахов кеша ответов со списками "
+        "и карточками рецептов. Счётчики общие для всех воркеров, "
+        "если CACHE_BACKEND общий."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Обнулить счётчики после вывода.",
+        )
+
+    def handle(self, *args, **options):
+        stats = recipes_cache.stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+        self.stdout.write(
+            f"Попаданий: {stats['hits']}, промахов: {stats['misses']}, "
+            f"доля попаданий: {ratio:.1%}."
+        )
+        if options["reset"]:
+            recipes_cache.reset_stats()
@@ -0,0 +1,300 @@
+import json
+import re
+from datetime import timedelta
+
+from rest_framework.test import APIClient
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.enums import Tuples, UrlQueries
+from core.services import create_shoping_list
+from recipes.models import (
+    AmountIngredient,
+    Carts,
+    Favorite,
+    Ingredient,
+    Recipe,
+    Tag,
+)
+from users.models import Subscription
+
+User = get_user_model()
+
+USERS = 200
+RECIPES_PER_USER = 25
+INGREDIENTS = 500
+INGREDIENTS_PER_RECIPE = 8
+LINKS_PER_USER = 20
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)$")
+SQLITE_INDEX_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+) USING ")
+SQLITE_SORT = "USE TEMP B-TREE FOR ORDER BY"
+PG_INDEX_SCANS = ("Index Scan", "Index Only Scan")
+PG_SORTS = ("Sort", "Incremental Sort")
+
+# Справочники целиком читаются в реестр `core.registry`.
+FULL_SCAN_ALLOWED = (Tag, Ingredient)
+
+
+def api_cases(author, tag):
+    """Запросы к API, планы которых проверяет команда.
+
+    Поиск проверяется только в Postgres: в остальных БД он сводится к
+    `icontains`, которому индекс не поможет.
+    """
+    cases = [
+        ("recipes:list", "/api/recipes/", {}),
+        ("recipes:cursor", "/api/recipes/", {UrlQueries.CURSOR.value: ""}),
+        ("recipes:tags", "/api/recipes/", {UrlQueries.TAGS.value: tag.slug}),
+        (
+            "recipes:author",
+            "/api/recipes/",
+            {UrlQueries.AUTHOR.value: author.pk},
+        ),
+        (
+            "recipes:favorited",
+            "/api/recipes/",
+            {UrlQueries.FAVORITE.value: 1},
+        ),
+        ("recipes:cart", "/api/recipes/", {UrlQueries.SHOP_CART.value: 1}),
+        *(
+            (
+                f"recipes:ordering={ordering}",
+                "/api/recipes/",
+                {UrlQueries.ORDERING.value: ordering},
+            )
+            for field in Tuples.RECIPES_ORDERING.value
+            for ordering in (field, f"-{field}")
+        ),
+        ("recipes:detail", f"/api/recipes/{author.recipes.first().pk}/", {}),
+        ("users:subscriptions", "/api/users/subscriptions/", {}),
+        (
+            "users:subscriptions_limit",
+            "/api/users/subscriptions/",
+            {UrlQueries.RECIPES_LIMIT.value: 3, UrlQueries.CURSOR.value: ""},
+        ),
+    ]
+    if connection.vendor == "postgresql":
+        cases.append(
+            (
+                "recipes:search",
+                "/api/recipes/",
+                {UrlQueries.SEARCH.value: "суп"},
+            )
+        )
+    return cases
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет БД тестовыми данными, снимает EXPLAIN с запросов "
+        "RecipeViewSet, UserViewSet.subscriptions и create_shoping_list "
+        "и завершается ошибкой, если в плане есть полный просмотр "
+        "таблицы. Все изменения откатываются."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=USERS,
+            help="Сколько пользователей создать.",
+        )
+        parser.add_argument(
+            "--recipes-per-user",
+            type=int,
+            default=RECIPES_PER_USER,
+            help="Сколько рецептов создать каждому пользователю.",
+        )
+        parser.add_argument(
+            "--plans",
+            action="store_true",
+            help="Выводить планы всех запросов.",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ("postgresql", "sqlite"):
+            raise CommandError("Поддерживаются только Postgres и SQLite.")
+
+        with transaction.atomic():
+            user, author, tag = self._seed(
+                max(options["users"], 2), max(options["recipes_per_user"], 1)
+            )
+            self._prepare_planner()
+            failures = self._check(user, author, tag, options["plans"])
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(
+                "Полный просмотр таблиц:\n" + "\n".join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS("Полных просмотров нет."))
+
+    def _seed(self, users_count, recipes_per_user):
+        """Создаёт данные через `bulk_create`, не вызывая сигналов."""
+        suffix = timezone.now().strftime("%H%M%S%f")
+        users = User.objects.bulk_create(
+            User(
+                username=f"explain{suffix}_{index}",
+                email=f"explain{suffix}_{index}@example.com",
+                first_name="Имя",
+                last_name="Фамилия",
+            )
+            for index in range(users_count)
+        )
+        tags = Tag.objects.bulk_create(
+            Tag(
+                name=f"тег{suffix}{index}",
+                color="#000000",
+                slug=f"x{suffix}{index}",
+            )
+            for index in range(3)
+        )
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(
+                name=f"ингредиент {suffix} {index}", measurement_unit="г"
+            )
+            for index in range(INGREDIENTS)
+        )
+
+        now = timezone.now()
+        recipes = Recipe.objects.bulk_create(
+            Recipe(
+                author=author,
+                name=f"Суп {suffix} {index}",
+                text="Варить суп до готовности.",
+                cooking_time=10,
+                pub_date=now - timedelta(minutes=index),
+            )
+            for author in users
+            for index in range(recipes_per_user)
+        )
+        Recipe.tags.through.objects.bulk_create(
+            Recipe.tags.through(recipe=recipe, tag=tags[index % len(tags)])
+            for index, recipe in enumerate(recipes)
+        )
+        AmountIngredient.objects.bulk_create(
+            AmountIngredient(
+                recipe=recipe,
+                ingredients=ingredients[(index + offset) % INGREDIENTS],
+                amount=1,
+            )
+            for index, recipe in enumerate(recipes)
+            for offset in range(INGREDIENTS_PER_RECIPE)
+        )
+
+        links = min(LINKS_PER_USER, len(recipes))
+        for model in (Favorite, Carts):
+            model.objects.bulk_create(
+                model(
+                    user=user,
+                    recipe=recipes[(index * 7 + step) % len(recipes)],
+                )
+                for index, user in enumerate(users)
+                for step in range(links)
+            )
+        Subscription.objects.bulk_create(
+            Subscription(user=user, author=users[(index + step) % users_count])
+            for index, user in enumerate(users)
+            for step in range(1, min(LINKS_PER_USER, users_count - 1) + 1)
+        )
+        return users[0], users[1], tags[0]
+
+    def _prepare_planner(self):
+        """Собирает статистику и запрещает Postgres полный просмотр.
+
+        На тестовых данных таблицы маленькие, и планировщик вправе
+        читать их целиком. С `enable_seqscan = off` он выбирает полный
+        просмотр, только если подходящего индекса нет.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+            if connection.vendor == "postgresql":
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def _check(self, user, author, tag, show_plans):
+        client = APIClient()
+        client.force_authenticate(user)
+        cases = [
+            (name, lambda path=path, params=params: client.get(path, params))
+            for name, path, params in api_cases(author, tag)
+        ]
+        cases.append(
+            ("create_shoping_list", lambda: "".join(create_shoping_list(user)))
+        )
+
+        checked_tables = {
+            model._meta.db_table for model in apps.get_models()
+        } - {model._meta.db_table for model in FULL_SCAN_ALLOWED}
+
+        failures = []
+        for name, run in cases:
+            with CaptureQueriesContext(connection) as context:
+                response = run()
+            status = getattr(response, "status_code", 200)
+            if status != 200:
+                failures.append(f"{name}: ответ {status}")
+                continue
+
+            for query in context.captured_queries:
+                sql = query["sql"]
+                if not sql.lstrip().upper().startswith("SELECT"):
+                    continue
+                plan, scans = self._explain(sql)
+                if show_plans:
+                    self.stdout.write(f"{name}: {sql}\n{plan}\n")
+                failures.extend(
+                    f"{name}: {table} <- {sql[:200]}"
+                    for table in scans
+                    if table in checked_tables
+                )
+            self.stdout.write(f"{name}: запросов {len(context)}")
+        return failures
+
+    def _explain(self, sql):
+        """Возвращает план запроса и таблицы, читаемые целиком.
+
+        Полный просмотр - это `Seq Scan`, а также проход по всему
+        индексу без условия, результат которого потом сортируется:
+        так планировщик обходит запрет `enable_seqscan`, когда нет
+        индекса под нужную сортировку.
+        """
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return json.dumps(plan, indent=2), [
+                    node["Relation Name"]
+                    for node, sorted_ in _plan_nodes(plan[0]["Plan"])
+                    if node["Node Type"] == "Seq Scan"
+                    or sorted_
+                    and node["Node Type"] in PG_INDEX_SCANS
+                    and "Index Cond" not in node
+                ]
+
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[-1] for row in cursor.fetchall()]
+            patterns = [SQLITE_FULL_SCAN]
+            if SQLITE_SORT in details:
+                patterns.append(SQLITE_INDEX_SCAN)
+            return "\n".join(details), [
+                match[1]
+                for pattern in patterns
+                for match in map(pattern.match, details)
+                if match
+            ]
+
+
+def _plan_nodes(node, sorted_=False):
+    """Обходит узлы плана Postgres; `sorted_` - есть ли выше сортировка."""
+    yield node, sorted_
+    sorted_ = sorted_ or node["Node Type"] in PG_SORTS
+    for child in node.get("Plans", ()):
+        yield from _plan_nodes(child, sorted_)
@@ -0,0 +1,237 @@
+import csv
+import json
+from io import StringIO
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core.cache import recipes_cache, reference_cache
+from core.checks import PROCESS_LOCAL_CACHES
+from core.validators import hex_color_validator
+from foodgram.settings import BASE_DIR
+from recipes.models import Ingredient, Tag
+
+DEFAULT_PATHS = (
+    BASE_DIR.parent / "data" / "ingredients.csv",
+    BASE_DIR.parent / "data" / "ingredients.json",
+    BASE_DIR / "data" / "dump.json",
+)
+BATCH_SIZE = 5000
+JSON_CHUNK_SIZE = 64 * 1024
+JSON_SKIP = " \t\r\n,"
+
+
+def iter_json_array(file, chunk_size=JSON_CHUNK_SIZE):
+    """Читает JSON-массив по одному элементу, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise CommandError("Ожидался JSON-массив.")
+
+    position, eof = 1, False
+    while True:
+        position = _skip_separators(buffer, position)
+        if position < len(buffer):
+            if buffer[position] == "]":
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as error:
+                if eof:
+                    raise CommandError(f"Ошибка в JSON: {error}")
+            else:
+                yield item
+                continue
+        elif eof:
+            raise CommandError("JSON-массив не закрыт.")
+
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, position = buffer[position:] + chunk, 0
+
+
+def _skip_separators(buffer, position):
+    while position < len(buffer) and buffer[position] in JSON_SKIP:
+        position += 1
+    return position
+
+
+def read_records(path):
+    """Возвращает пары `(модель, поля)` из CSV, JSON или фикстуры."""
+    with open(path, encoding="utf-8", newline="") as file:
+        if path.suffix == ".csv":
+            for row in csv.reader(file):
+                if row:
+                    yield "ingredient", {
+                        "name": row[0],
+                        "measurement_unit": row[1] if len(row) > 1 else "",
+                    }
+        elif path.suffix == ".json":
+            for item in iter_json_array(file):
+                if "model" in item:
+                    model = item["model"].rpartition(".")[2].lower()
+                    yield model, item.get("fields", {})
+                else:
+                    yield "ingredient", item
+        else:
+            raise CommandError(f"Неизвестный формат файла: {path}")
+
+
+def normalize_ingredient(fields):
+    """Приводит ингредиент к виду, который даёт `Ingredient.clean`."""
+    name = str(fields.get("name", "")).strip().lower()
+    unit = str(fields.get("measurement_unit", "")).strip().lower()
+    if (
+        not name
+        or not unit
+        or len(name) > Ingredient._meta.get_field("name").max_length
+        or len(unit)
+        > Ingredient._meta.get_field("measurement_unit").max_length
+    ):
+        return None
+    return name, unit
+
+
+def normalize_tag(fields):
+    """Приводит тег к виду, который даёт `Tag.clean`."""
+    try:
+        return Tag(
+            name=str(fields["name"]).strip().lower(),
+            slug=str(fields["slug"]).strip().lower(),
+            color=hex_color_validator(str(fields["color"])),
+        )
+    except (KeyError, ValidationError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает теги и ингредиенты из CSV, JSON и фикстур пачками. "
+        "Повторная загрузка не создаёт дублей."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="*",
+            type=Path,
+            help="Файлы для загрузки. По умолчанию - файлы из data/.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Сколько строк вставлять за один запрос.",
+        )
+
+    def handle(self, *args, **options):
+        paths = options["paths"] or [
+            path for path in DEFAULT_PATHS if path.exists()
+        ]
+        if not paths:
+            raise CommandError("Не найдено ни одного файла для загрузки.")
+        for path in paths:
+            if not path.exists():
+                raise CommandError(f"Файл не найден: {path}")
+
+        batch_size = max(options["batch_size"], 1)
+        for path in paths:
+            self._load(path, batch_size)
+
+        reference_cache.bump(
+            Tag._meta.model_name, Ingredient._meta.model_name
+        )
+        recipes_cache.bump("epoch")
+        if settings.CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHES:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Кеш не общий: запущенное приложение не узнает о новых "
+                    "данных до перезапуска."
+                )
+            )
+
+    def _load(self, path, batch_size):
+        counts_before = (Tag.objects.count(), Ingredient.objects.count())
+        read = skipped = 0
+        started = perf_counter()
+
+        records = read_records(path)
+        while batch := list(islice(records, batch_size)):
+            read += len(batch)
+            tags, ingredients = [], []
+            for model, fields in batch:
+                if model == "ingredient":
+                    row = normalize_ingredient(fields)
+                    target = ingredients
+                elif model == "tag":
+                    row = normalize_tag(fields)
+                    target = tags
+                else:
+                    row = None
+                if row is None:
+                    skipped += 1
+                else:
+                    target.append(row)
+
+            with transaction.atomic():
+                if tags:
+                    Tag.objects.bulk_create(tags, ignore_conflicts=True)
+                if ingredients:
+                    self._insert_ingredients(ingredients)
+
+        elapsed = perf_counter() - started
+        added = (
+            Tag.objects.count()
+            + Ingredient.objects.count()
+            - sum(counts_before)
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{path.name}: прочитано {read}, добавлено {added}, "
+                f"пропущено {skipped} за {elapsed:.2f} с "
+                f"({read / elapsed if elapsed else read:.0f} строк/с)."
+            )
+        )
+
+    def _insert_ingredients(self, rows):
+        """Вставляет ингредиенты, пропуская уже существующие.
+
+        В Postgres строки уходят через `COPY` во временную таблицу и
+        переносятся одним `INSERT ... ON CONFLICT DO NOTHING`, в
+        остальных БД - через `bulk_create(ignore_conflicts=True)`.
+        """
+        if connection.vendor != "postgresql":
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=unit)
+                    for name, unit in rows
+                ),
+                ignore_conflicts=True,
+            )
+            return
+
+        buffer = StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS ingredient_load "
+                "(name text, measurement_unit text) ON COMMIT DELETE ROWS"
+            )
+            cursor.copy_expert(
+                "COPY ingredient_load (name, measurement_unit) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+            cursor.execute(
+                f"INSERT INTO {table} (name, measurement_unit) "
+                "SELECT name, measurement_unit FROM ingredient_load "
+                "ON CONFLICT DO NOTHING"
+            )
@@ -0,0 +1,63 @@
+import base64
+import resource
+import tracemalloc
+from io import BytesIO
+from time import perf_counter
+
+from PIL import Image
+
+from django.core.management.base import BaseCommand
+
+from api.fields import RecipeImageField
+
+FORMATS = ("JPEG", "PNG")
+
+
+def make_payload(width, height, image_format):
+    """Возвращает картинку в виде data URI, как её присылает фронтенд."""
+    image = Image.effect_mandelbrot(
+        (width, height), (-2.0, -1.5, 1.0, 1.5), 100
+    ).convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, image_format)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f"data:image/{image_format.lower()};base64,{encoded}"
+
+
+class Command(BaseCommand):
+    help = (
+        "Замеряет время и память, которые тратит запрос на приём "
+        "картинки рецепта в base64 (`RecipeImageField`)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--width", type=int, default=4000)
+        parser.add_argument("--height", type=int, default=3000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        field = RecipeImageField()
+        for image_format in FORMATS:
+            payload = make_payload(
+                options["width"], options["height"], image_format
+            )
+            rss_before = _max_rss()
+            tracemalloc.start()
+            started = perf_counter()
+            for _ in range(max(options["repeat"], 1)):
+                field.to_internal_value(payload).close()
+            elapsed = (perf_counter() - started) / max(options["repeat"], 1)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            self.stdout.write(
+                f"{image_format} {options['width']}x{options['height']}, "
+                f"{len(payload) / 2**20:.1f} МБ base64: "
+                f"{elapsed * 1000:.0f} мс на запрос, "
+                f"пик Python-памяти {peak / 2**20:.1f} МБ, "
+                f"рост RSS {(_max_rss() - rss_before) / 2**10:.1f} МБ"
+            )
+
+
+def _max_rss():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
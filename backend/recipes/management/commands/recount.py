@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.counters import recount_recipes, recount_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает счётчики избранного, списков покупок, рецептов "
+        "и подписчиков. Исправляет только разошедшиеся строки."
+    )
+
+    def handle(self, *args, **options):
+        recipes = recount_recipes()
+        users = recount_users()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Исправлено рецептов: {recipes}, пользователей: {users}."
+            )
+        )
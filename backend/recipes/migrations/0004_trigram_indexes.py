@@ -0,0 +1,45 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+class PostgresAddIndex(migrations.AddIndex):
+    """Создаёт индекс только в Postgres, в остальных БД меняет лишь схему."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0003_rename_favorites_favorite_and_more"),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        PostgresAddIndex(
+            model_name="ingredient",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="recipes_ingredient_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        ),
+        PostgresAddIndex(
+            model_name="tag",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["name"],
+                name="recipes_tag_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+from core.counters import recount_recipes
+
+
+def fill_counters(apps, schema_editor):
+    recount_recipes(apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0005_recipe_image_renditions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="carts_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В списках покупок"
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="В избранном"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
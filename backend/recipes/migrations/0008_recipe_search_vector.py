@@ -0,0 +1,78 @@
+# Generated by Django 4.2.30 on 2026-10-18 21:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+CREATE FUNCTION recipes_recipe_search_vector() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER recipes_recipe_search_vector
+    BEFORE INSERT OR UPDATE OF name, text, search_vector
+    ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector();
+
+UPDATE recipes_recipe SET search_vector = NULL;
+"""
+
+DROP_SEARCH_VECTOR_SQL = """
+DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe;
+DROP FUNCTION IF EXISTS recipes_recipe_search_vector();
+"""
+
+
+class PostgresOnlyMixin:
+    """Выполняет операцию только в Postgres, в остальных БД меняет схему."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_forwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == "postgresql":
+            super().database_backwards(
+                app_label, schema_editor, from_state, to_state
+            )
+
+
+class PostgresAddIndex(PostgresOnlyMixin, migrations.AddIndex):
+    pass
+
+
+class PostgresRunSQL(PostgresOnlyMixin, migrations.RunSQL):
+    pass
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0007_feedentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="Заполняется триггером БД из названия и описания",
+                null=True,
+                verbose_name="Поисковый вектор",
+            ),
+        ),
+        PostgresRunSQL(SEARCH_VECTOR_SQL, DROP_SEARCH_VECTOR_SQL),
+        PostgresAddIndex(
+            model_name="recipe",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="recipes_recipe_search"
+            ),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("recipes", "0008_recipe_search_vector"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="amountingredient",
+            index=models.Index(
+                fields=["ingredients", "recipe"],
+                include=("amount",),
+                name="recipes_amount_ingredient",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="carts",
+            index=models.Index(
+                fields=["user", "recipe"], name="recipes_carts_user"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="favorite",
+            index=models.Index(
+                fields=["user", "recipe"], name="recipes_favorite_user"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["-pub_date", "-id"], name="recipes_recipe_date"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["author", "-pub_date", "-id"],
+                name="recipes_recipe_author_date",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="amountingredient",
+            name="ingredients",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="recipe",
+                to="recipes.ingredient",
+                verbose_name="Связанные ингредиенты",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="carts",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="carts",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Владелец списка",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="favorite",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="favorites",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Пользователь",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="recipe",
+            name="author",
+            field=models.ForeignKey(
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="recipes",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Автор рецепта",
+            ),
+        ),
+    ]
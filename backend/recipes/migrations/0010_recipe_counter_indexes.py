@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 23:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0009_hot_path_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["favorites_count", "id"],
+                name="recipes_recipe_favorites",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["carts_count", "id"], name="recipes_recipe_carts"
+            ),
+        ),
+    ]
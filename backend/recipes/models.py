@@ -1,11 +1,15 @@
-from PIL import Image
+from functools import partial
 
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models.functions import Length
 
-from core.enums import Limits, Tuples
+from core.counters import CounterFieldsMixin
+from core.enums import Limits
+from core.images import schedule_renditions
 from core.validators import OneOfTwoValidator, hex_color_validator
 
 User = get_user_model()
@@ -41,6 +45,13 @@ class Tag(models.Model):
         verbose_name = "Тег"
         verbose_name_plural = "Тэги"
         ordering = ("name",)
+        indexes = (
+            GinIndex(
+                fields=("name",),
+                name="recipes_tag_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        )
 
     def __str__(self):
         return f"{self.name} (цвет: {self.color})"
@@ -66,6 +77,13 @@ class Ingredient(models.Model):
         verbose_name = "Ингредиент"
         verbose_name_plural = "Ингредиенты"
         ordering = ("name",)
+        indexes = (
+            GinIndex(
+                fields=("name",),
+                name="recipes_ingredient_name_trgm",
+                opclasses=("gin_trgm_ops",),
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=("name", "measurement_unit"),
@@ -90,7 +108,7 @@ class Ingredient(models.Model):
         super().clean()
 
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     tags = models.ManyToManyField(
         Tag,
         verbose_name="Тег",
@@ -102,6 +120,7 @@ class Recipe(models.Model):
         related_name="recipes",
         on_delete=models.SET_NULL,
         null=True,
+        db_index=False,
     )
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -119,6 +138,12 @@ class Recipe(models.Model):
         upload_to="recipe_images/",
         blank=True,
     )
+    image_renditions = models.JSONField(
+        verbose_name="Уменьшенные копии картинки",
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name="Текстовое описание",
         help_text="Введите описание рецепта",
@@ -142,11 +167,49 @@ class Recipe(models.Model):
         auto_now_add=True,
         editable=False,
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name="В избранном",
+        default=0,
+        editable=False,
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name="В списках покупок",
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name="Поисковый вектор",
+        help_text="Заполняется триггером БД из названия и описания",
+        null=True,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = "Рецепт"
         verbose_name_plural = "Рецепты"
         ordering = ("-pub_date",)
+        indexes = (
+            models.Index(
+                fields=("-pub_date", "-id"),
+                name="recipes_recipe_date",
+            ),
+            models.Index(
+                fields=("author", "-pub_date", "-id"),
+                name="recipes_recipe_author_date",
+            ),
+            models.Index(
+                fields=("favorites_count", "id"),
+                name="recipes_recipe_favorites",
+            ),
+            models.Index(
+                fields=("carts_count", "id"),
+                name="recipes_recipe_carts",
+            ),
+            GinIndex(
+                fields=("search_vector",),
+                name="recipes_recipe_search",
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=("name", "author"),
@@ -158,6 +221,28 @@ class Recipe(models.Model):
             ),
         )
 
+    counter_fields = ("favorites_count", "carts_count")
+
+    _saved_image = None
+    _saved_author_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает картинку и автора, какими они загружены из БД.
+
+        Отложенные (`defer`/`only`) поля не читаются, вместо значения
+        запоминается `DEFERRED`.
+        """
+        recipe = super().from_db(db, field_names, values)
+        deferred = recipe.get_deferred_fields()
+        recipe._saved_image = (
+            models.DEFERRED if "image" in deferred else recipe.image.name
+        )
+        recipe._saved_author_id = (
+            models.DEFERRED if "author_id" in deferred else recipe.author_id
+        )
+        return recipe
+
     def __str__(self):
         return f"{self.name}. Автор: {self.author.username}"
 
@@ -166,10 +251,27 @@ class Recipe(models.Model):
         return super().clean()
 
     def save(self, *args, **kwargs):
+        deferred = self.get_deferred_fields()
+        if self._saved_author_id is models.DEFERRED:
+            self._saved_author_id = (
+                Recipe.objects.filter(pk=self.pk)
+                .values_list("author_id", flat=True)
+                .first()
+            )
+            if "author_id" in deferred:
+                self.author_id = self._saved_author_id
+
         super().save(*args, **kwargs)
-        image = Image.open(self.image.path)
-        image.thumbnail(Tuples.RECIPE_IMAGE_SIZE)
-        image.save(self.image.path)
+        self._saved_author_id = self.author_id
+        if (
+            "image" not in deferred
+            and self.image
+            and self.image.name != self._saved_image
+        ):
+            self._saved_image = self.image.name
+            transaction.on_commit(
+                partial(schedule_renditions, self.pk, self.image.name)
+            )
 
 
 class AmountIngredient(models.Model):
@@ -184,6 +286,7 @@ class AmountIngredient(models.Model):
         verbose_name="Связанные ингредиенты",
         related_name="recipe",
         on_delete=models.CASCADE,
+        db_index=False,
     )
     amount = models.PositiveSmallIntegerField(
         verbose_name="Количество",
@@ -204,6 +307,13 @@ class AmountIngredient(models.Model):
         verbose_name = "Ингридиент"
         verbose_name_plural = "Количество ингридиентов"
         ordering = ("recipe",)
+        indexes = (
+            models.Index(
+                fields=("ingredients", "recipe"),
+                name="recipes_amount_ingredient",
+                include=("amount",),
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=(
@@ -230,6 +340,7 @@ class Favorite(models.Model):
         verbose_name="Пользователь",
         related_name="favorites",
         on_delete=models.CASCADE,
+        db_index=False,
     )
     date_added = models.DateTimeField(
         verbose_name="Дата добавления",
@@ -240,6 +351,12 @@ class Favorite(models.Model):
     class Meta:
         verbose_name = "Избранный рецепт"
         verbose_name_plural = "Избранные рецепты"
+        indexes = (
+            models.Index(
+                fields=("user", "recipe"),
+                name="recipes_favorite_user",
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=(
@@ -266,6 +383,7 @@ class Carts(models.Model):
         verbose_name="Владелец списка",
         related_name="carts",
         on_delete=models.CASCADE,
+        db_index=False,
     )
     date_added = models.DateTimeField(
         verbose_name="Дата добавления",
@@ -276,6 +394,12 @@ class Carts(models.Model):
     class Meta:
         verbose_name = "Рецепт в списке покупок"
         verbose_name_plural = "Рецепты в списке покупок"
+        indexes = (
+            models.Index(
+                fields=("user", "recipe"),
+                name="recipes_carts_user",
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=(
@@ -288,3 +412,44 @@ class Carts(models.Model):
 
     def __str__(self):
         return f"{self.user} -> {self.recipe}"
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        verbose_name="Читатель ленты",
+        related_name="feed",
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name="Рецепт",
+        related_name="feed_entries",
+        on_delete=models.CASCADE,
+    )
+    pub_date = models.DateTimeField(
+        verbose_name="Дата публикации",
+    )
+
+    class Meta:
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Ленты подписок"
+        indexes = (
+            models.Index(
+                fields=("user", "-pub_date", "-recipe"),
+                name="recipes_feed_user_date",
+            ),
+        )
+        constraints = (
+            models.UniqueConstraint(
+                fields=(
+                    "user",
+                    "recipe",
+                ),
+                name="\n%(app_label)s_%(class)s recipe is in feed alredy\n",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.user} <- {self.recipe}"
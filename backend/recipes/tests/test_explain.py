@@ -0,0 +1,30 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+
+from recipes.management.commands.explain_queries import Command
+
+
+@skipUnless(connection.vendor == "postgresql", "планы проверяются в Postgres")
+class ExplainQueriesTest(TestCase):
+    """Запросы горячих путей API читают таблицы по индексам.
+
+    Данные и проверка - те же, что у команды `explain_queries`. Если
+    тест упал, в запрос попало условие или сортировка, под которые
+    нет индекса.
+    """
+
+    USERS = 20
+    RECIPES_PER_USER = 5
+
+    def setUp(self):
+        cache.clear()
+
+    def test_no_full_scans(self):
+        command = Command(stdout=StringIO())
+        user, author, tag = command._seed(self.USERS, self.RECIPES_PER_USER)
+        command._prepare_planner()
+        self.assertEqual(command._check(user, author, tag, False), [])
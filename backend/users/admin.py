@@ -1,6 +1,11 @@
 from django.contrib.admin import ModelAdmin, register
 from django.contrib.auth.admin import UserAdmin
 
+from core.admin_tools import (
+    AutocompleteFilter,
+    AutocompleteFilterMixin,
+    EstimatedCountPaginator,
+)
 from users.models import MyUser, Subscription
 
 
@@ -12,6 +17,8 @@ class MyUserAdmin(UserAdmin):
         "username",
         "first_name",
         "last_name",
+        "recipes_count",
+        "subscribers_count",
     )
     list_display_links = (
         "email",
@@ -38,26 +45,28 @@ class MyUserAdmin(UserAdmin):
         "is_active",
     )
     save_on_top = True
-
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset.select_related("username")
-        return queryset
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @register(Subscription)
-class SubscriptionAdmin(ModelAdmin):
+class SubscriptionAdmin(AutocompleteFilterMixin, ModelAdmin):
     list_display = (
         "user",
         "author",
         "date_added",
     )
     search_fields = (
-        "user",
-        "author",
+        "user__username",
+        "author__username",
+    )
+    list_filter = (
+        ("user", AutocompleteFilter),
+        ("author", AutocompleteFilter),
     )
+    autocomplete_fields = ("user", "author")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
     def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        queryset.select_related("user", "author")
-        return queryset
+        return super().get_queryset(request).select_related("user", "author")
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+from core.counters import recount_users
+
+
+def fill_counters(apps, schema_editor):
+    recount_users(apps)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("recipes", "0006_recipe_counters"),
+        ("users", "0002_subscription_delete_subscriptions_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="myuser",
+            name="recipes_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Рецептов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="myuser",
+            name="subscribers_count",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="Подписчиков"
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 22:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("users", "0003_myuser_counters"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="subscription",
+            index=models.Index(
+                fields=["user", "-date_added", "-author"],
+                name="users_subscription_user_date",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="subscription",
+            name="user",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="subscription",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Подписчики",
+            ),
+        ),
+    ]
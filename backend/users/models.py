@@ -6,13 +6,14 @@ from django.db.models.functions import Length
 from django.utils.translation import gettext_lazy as _
 
 from core import texts
+from core.counters import CounterFieldsMixin
 from core.enums import Limits
 from core.validators import MinLenValidator, OneOfTwoValidator
 
 models.CharField.register_lookup(Length)
 
 
-class MyUser(AbstractUser):
+class MyUser(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(
         verbose_name="Адрес электронной почты",
         max_length=Limits.MAX_LEN_EMAIL_FIELD.value,
@@ -70,6 +71,18 @@ class MyUser(AbstractUser):
         verbose_name="Активирован",
         default=True,
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name="Рецептов",
+        default=0,
+        editable=False,
+    )
+    subscribers_count = models.PositiveIntegerField(
+        verbose_name="Подписчиков",
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ("recipes_count", "subscribers_count")
 
     class Meta:
         verbose_name = "Пользователь"
@@ -87,6 +100,17 @@ class MyUser(AbstractUser):
     def __str__(self):
         return f"{self.username}: {self.email}"
 
+    def refresh_from_db(self, using=None, fields=None):
+        """Догружает все отложенные поля разом, а не по одному.
+
+        Пользователь из кеша токенов загружен не полностью, и без этого
+        сериализатор профиля ходил бы в БД за каждым полем.
+        """
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred.issuperset(fields):
+            fields = deferred
+        super().refresh_from_db(using=using, fields=fields)
+
     @classmethod
     def normalize_email(cls, email):
         email = email or ""
@@ -138,6 +162,7 @@ class Subscription(models.Model):
         related_name="subscription",
         to=MyUser,
         on_delete=models.CASCADE,
+        db_index=False,
     )
     date_added = models.DateTimeField(
         verbose_name="Дата создания подписки",
@@ -148,6 +173,12 @@ class Subscription(models.Model):
     class Meta:
         verbose_name = "Подписка"
         verbose_name_plural = "Подписки"
+        indexes = (
+            models.Index(
+                fields=("user", "-date_added", "-author"),
+                name="users_subscription_user_date",
+            ),
+        )
         constraints = (
             models.UniqueConstraint(
                 fields=("author", "user"),